@@ -1,21 +1,37 @@
+import asyncio
 import logging
+import time
 from abc import ABC, abstractmethod
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
 from sqlalchemy.ext.asyncio import (
+    AsyncConnection,
+    AsyncEngine,
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
 from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
+from app.services.metrics import Callback, db_pool_wait, registry
 from app.settings import get_current_config
 
 logger = logging.getLogger("build-system")
 
 __all__ = (
+    "async_registry",
     "get_sync_session_factory",
     "get_async_session_factory",
+    "get_async_read_session_factory",
+)
+
+# Seconds a Postgres standby is behind its primary, 0 on the primary.
+POSTGRES_REPLICATION_LAG = text(
+    "SELECT CASE WHEN pg_is_in_recovery() THEN coalesce("
+    "extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0) "
+    "ELSE 0 END"
 )
 
 
@@ -48,6 +64,312 @@ class SyncDatabaseConnector(AbstractDatabaseConnector):
         return sessionmaker(self.engine)
 
 
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that reports how long checkouts wait for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_wait.observe(time.perf_counter() - start)
+
+
+class Replica:
+    """Read replica engine and its last health check result.
+
+    A replica starts unhealthy and serves reads only after a check has
+    reached it and found its replication lag within ``max_lag`` seconds.
+    A disconnect or a connection error seen by any query marks it
+    unhealthy until the next successful check, the failed statement is
+    retried on ``primary``, see ``ReplicaSession``.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        max_lag: float | None = None,
+        primary: AsyncEngine | None = None,
+    ):
+        config = get_current_config()
+        self.url = url
+        self.max_lag = max_lag
+        self.healthy = False
+        self.lag: float | None = None
+        self.connector = AsyncDatabaseConnector(
+            url=url,
+            **{"poolclass": TimedQueuePool, **config.DATABASE_SETTINGS},
+        )
+        if primary is not None:
+            primary = primary.execution_options(postgresql_readonly=True)
+        self.session_factory = read_only_session_factory(
+            self.connector.engine,
+            class_=ReplicaSession,
+            replica=self,
+            primary=primary,
+        )
+        event.listen(
+            self.connector.engine.sync_engine, "handle_error", self._on_error
+        )
+
+    @property
+    def name(self) -> str:
+        return self.connector.engine.url.render_as_string()
+
+    async def check(self) -> bool:
+        try:
+            async with self.connector.engine.connect() as connection:
+                self.lag = await replication_lag(connection)
+        except Exception as e:
+            self.mark_down(e)
+            return False
+        healthy = self.max_lag is None or self.lag <= self.max_lag
+        if healthy != self.healthy:
+            state = "is up" if healthy else f"lags {self.lag:.1f} s"
+            logger.warning(f"Replica {self.name} {state}")
+        self.healthy = healthy
+        return healthy
+
+    def mark_down(self, error: Exception) -> None:
+        if self.healthy:
+            logger.warning(f"Replica {self.name} is down: {error}")
+        self.healthy = False
+
+    def _on_error(self, context) -> None:
+        if context.is_disconnect:
+            self.mark_down(context.original_exception)
+
+
+def is_connection_error(error: Exception) -> bool:
+    """Whether ``error`` tells that the database could not be reached."""
+    if isinstance(error, DBAPIError):
+        return error.connection_invalidated or isinstance(
+            error, (InterfaceError, OperationalError)
+        )
+    return isinstance(error, OSError)
+
+
+class ReplicaSession(AsyncSession):
+    """Read only session of a replica that falls back to the primary.
+
+    A statement failing with a connection error marks the replica down
+    and runs once more on the primary, where the session stays. The
+    session is read only, so nothing done before the failure is lost.
+    """
+
+    def __init__(
+        self,
+        *args,
+        replica: Replica,
+        primary: AsyncEngine | None = None,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.replica = replica
+        self.primary = primary
+
+    async def execute(self, *args, **kwargs):
+        return await self.__retried(super().execute, *args, **kwargs)
+
+    async def scalar(self, *args, **kwargs):
+        return await self.__retried(super().scalar, *args, **kwargs)
+
+    async def stream(self, *args, **kwargs):
+        return await self.__retried(super().stream, *args, **kwargs)
+
+    async def __retried(self, method, *args, **kwargs):
+        try:
+            return await method(*args, **kwargs)
+        except Exception as e:
+            if self.primary is None or self.bind is self.primary:
+                raise
+            if not is_connection_error(e):
+                raise
+            self.replica.mark_down(e)
+        logger.warning(f"Read retried on the primary: {self.replica.name}")
+        await self.rollback()
+        self.bind = self.primary
+        self.sync_session.bind = self.primary.sync_engine
+        return await method(*args, **kwargs)
+
+
+def read_only_session_factory(
+    engine: AsyncEngine,
+    **kwargs,
+) -> async_sessionmaker[AsyncSession]:
+    """Sessions of ``engine`` in read only transactions.
+
+    Postgres rejects writes in them, other dialects ignore the option.
+    ``kwargs`` are passed to the sessions, e.g. ``class_``.
+    """
+    config = get_current_config()
+    return async_sessionmaker(
+        engine.execution_options(postgresql_readonly=True),
+        **config.SESSION_SETTINGS,
+        **kwargs,
+    )
+
+
+async def replication_lag(connection: AsyncConnection) -> float:
+    if connection.dialect.name != "postgresql":
+        return 0.0
+    return float(await connection.scalar(POSTGRES_REPLICATION_LAG))
+
+
+class AsyncEngineRegistry:
+    """App-wide async engine with a single connection pool.
+
+    The engine is created once, on ``connect`` in the application lifespan
+    or lazily on first use, and is shared by every request until
+    ``dispose`` is called on shutdown.
+
+    Reads may be spread over ``DATABASE_REPLICA_URLS`` round robin. Their
+    health is checked on ``connect`` and then every
+    ``REPLICA_CHECK_INTERVAL`` seconds, reads fall back to the primary
+    while no replica is healthy.
+    """
+
+    def __init__(self, replica_urls: list[str] | None = None):
+        self._connector: AsyncDatabaseConnector | None = None
+        self._session_factory: async_sessionmaker[AsyncSession] | None = None
+        self._read_session_factory: async_sessionmaker[AsyncSession] | None = (
+            None
+        )
+        self._replica_urls = replica_urls
+        self._replicas: list[Replica] | None = None
+        self._next_replica = 0
+        self._monitor: asyncio.Task | None = None
+
+    @property
+    def engine(self) -> AsyncEngine:
+        if self._connector is None:
+            self._create()
+        return self._connector.engine
+
+    @property
+    def session_factory(self) -> async_sessionmaker[AsyncSession]:
+        if self._session_factory is None:
+            self._create()
+        return self._session_factory
+
+    def _create(self) -> None:
+        config = get_current_config()
+        self._connector = AsyncDatabaseConnector(
+            url=f"{config.ASYNC_DB_DRIVER}{config.database_url}",
+            **{"poolclass": TimedQueuePool, **config.DATABASE_SETTINGS},
+        )
+        self._session_factory = async_sessionmaker(
+            self._connector.engine,
+            **config.SESSION_SETTINGS,
+        )
+        self._read_session_factory = read_only_session_factory(
+            self._connector.engine
+        )
+        logger.info("Async database engine created")
+
+    @property
+    def replicas(self) -> list[Replica]:
+        if self._replicas is None:
+            config = get_current_config()
+            urls = self._replica_urls
+            if urls is None:
+                urls = config.DATABASE_REPLICA_URLS
+            self._replicas = [
+                Replica(url, config.REPLICA_MAX_LAG, self.engine)
+                for url in urls
+            ]
+        return self._replicas
+
+    def next_read_session_factory(self) -> async_sessionmaker[AsyncSession]:
+        """Read only sessions of the next healthy replica or the primary.
+
+        Every call moves the round robin to the next replica.
+        """
+        replicas = self.replicas
+        for _ in range(len(replicas)):
+            replica = replicas[self._next_replica % len(replicas)]
+            self._next_replica += 1
+            if replica.healthy:
+                return replica.session_factory
+        if self._read_session_factory is None:
+            self._create()
+        return self._read_session_factory
+
+    async def check_replicas(self) -> None:
+        await asyncio.gather(*(i.check() for i in self.replicas))
+
+    async def _monitor_replicas(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.check_replicas()
+
+    async def connect(self) -> None:
+        config = get_current_config()
+        await self.warm_up(config.DATABASE_POOL_MIN_SIZE)
+        if self.replicas:
+            await self.check_replicas()
+            healthy = sum(i.healthy for i in self.replicas)
+            logger.info(f"{healthy} of {len(self.replicas)} replicas up")
+            if config.REPLICA_CHECK_INTERVAL and self._monitor is None:
+                self._monitor = asyncio.create_task(
+                    self._monitor_replicas(config.REPLICA_CHECK_INTERVAL)
+                )
+
+    async def warm_up(self, size: int) -> None:
+        """Open ``size`` connections at once and return them to the pool."""
+        if size <= 0:
+            return
+        connections = await asyncio.gather(
+            *(self.engine.connect() for _ in range(size))
+        )
+        for connection in connections:
+            await connection.close()
+        logger.info(f"Connection pool warmed up with {size} connections")
+
+    async def dispose(self) -> None:
+        if self._monitor is not None:
+            self._monitor.cancel()
+            self._monitor = None
+        if self._replicas is not None:
+            for replica in self._replicas:
+                await replica.connector.engine.dispose()
+            self._replicas = None
+        if self._connector is None:
+            return
+        await self._connector.engine.dispose()
+        self._connector = None
+        self._session_factory = None
+        self._read_session_factory = None
+        logger.info("Async database engine disposed")
+
+
+async_registry = AsyncEngineRegistry()
+
+
+def _pool_stats() -> list[tuple[tuple, float]]:
+    if async_registry._connector is None:
+        return []
+    pool = async_registry.engine.sync_engine.pool
+    if not isinstance(pool, QueuePool):
+        return []
+    return [
+        (("size",), pool.size()),
+        (("checked_out",), pool.checkedout()),
+        (("overflow",), max(pool.overflow(), 0)),
+        (("idle",), pool.checkedin()),
+    ]
+
+
+registry.register(
+    Callback(
+        "db_pool_connections",
+        "Connections of the async engine pool by state.",
+        _pool_stats,
+        ("state",),
+    )
+)
+
+
 def get_sync_session_factory() -> Session:
     config = get_current_config()
     connector = SyncDatabaseConnector(
@@ -58,9 +380,9 @@ def get_sync_session_factory() -> Session:
 
 
 def get_async_session_factory() -> AsyncSession:
-    config = get_current_config()
-    connector = AsyncDatabaseConnector(
-        url=f"{config.ASYNC_DB_DRIVER}{config.database_url}",
-        **config.DATABASE_SETTINGS,
-    )
-    return connector.session_factory(**config.SESSION_SETTINGS)
+    return async_registry.session_factory()
+
+
+def get_async_read_session_factory() -> AsyncSession:
+    """Read only session, bound to a healthy replica if there is one."""
+    return async_registry.next_read_session_factory()()
@@ -1 +1,18 @@
 EARTH_RADIUS = 6371
+# Nearest companies are searched in circles growing from the first radius
+# until enough are found or the largest circle is reached, at most 6
+# index range scans. Companies farther than it are never returned.
+NEAREST_FIRST_RADIUS = 1
+NEAREST_RADIUS_GROWTH = 4
+NEAREST_MAX_RADIUS = 1000
+ACTIVITY_TREE_DEPTH = 3
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+EXPORT_CHUNK_SIZE = 1000
+IMPORT_CHUNK_SIZE = 5000
+IMPORT_LIST_SEPARATOR = ";"
+# Map viewports show companies from this zoom level if there are at most
+# VIEWPORT_MAX_COMPANIES of them, clusters on a grid of cells otherwise.
+VIEWPORT_COMPANIES_ZOOM = 15
+VIEWPORT_MAX_COMPANIES = 500
+VIEWPORT_GRID_CELLS = 16
@@ -1,6 +1,26 @@
-from app.connectors.sql import get_async_session_factory
+from collections.abc import AsyncIterator
+
+from app.connectors.sql import get_async_read_session_factory
+from app.services.cache import get_company_cache
+from app.services.facets import get_activity_facets
+from app.services.geo_engine import get_geo_engine
 from app.services.search_service import SearchService
+from app.services.single_flight import get_single_flight
+from app.services.taxonomy import get_activity_taxonomy
+
 
+async def get_find_service() -> AsyncIterator[SearchService]:
+    """Service of one request, all its queries share one read only session.
 
-def get_find_service() -> SearchService:
-    return SearchService(session_factory=get_async_session_factory())
+    The session is closed after the endpoint, its transaction is rolled
+    back and never committed.
+    """
+    async with get_async_read_session_factory() as session:
+        yield SearchService(
+            session=session,
+            geo_engine=get_geo_engine(),
+            taxonomy=get_activity_taxonomy(),
+            company_cache=get_company_cache(),
+            single_flight=get_single_flight(),
+            facets=get_activity_facets(),
+        )
@@ -0,0 +1,40 @@
+"""Bulk import of companies from CSV or NDJSON files.
+
+Run:
+    python -m app.import_data companies.ndjson
+    python -m app.import_data companies.csv --chunk-size 10000
+"""
+
+import argparse
+from pathlib import Path
+
+from app.connectors.sql import get_sync_session_factory
+from app.constants import IMPORT_CHUNK_SIZE
+from app.services.importer import READERS, CompanyImporter
+from app.settings import setup_logger
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", type=Path)
+    parser.add_argument(
+        "--format",
+        choices=sorted(READERS),
+        help="File format, by default taken from the file extension",
+    )
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    logger = setup_logger()
+    read = READERS[args.format or args.path.suffix.lstrip(".").lower()]
+    with get_sync_session_factory() as session:
+        importer = CompanyImporter(session, args.chunk_size)
+        report = importer.run(read(args.path))
+    logger.info(
+        f"Imported {report.rows} companies in {report.seconds:.1f} s, "
+        f"{report.rows_per_second:.0f} rows/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,18 @@ import uvicorn
 from fastapi import FastAPI
 
 from app.routers import api_router
+from app.routers.metrics import metrics_router
 from app.utils.lifespan import lifespan
+from app.utils.middlewares import MetricsMiddleware, QueryAccountingMiddleware
 
 app = FastAPI(
     title="OrganizationApp",
     lifespan=lifespan,
 )
+app.add_middleware(QueryAccountingMiddleware)
+app.add_middleware(MetricsMiddleware)
 app.include_router(api_router)
+app.include_router(metrics_router)
 
 if __name__ == "__main__":
     uvicorn.run(app="__main__:app", host="0.0.0.0", port=8000)
@@ -11,7 +11,14 @@ settings = get_current_config()
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
-config.set_main_option("sqlalchemy.url",f"{settings.SYNC_DB_DRIVER}{settings.database_url}")
+# A caller may point migrations at another database, e.g. benchmarks.
+url = config.attributes.get("sqlalchemy.url")
+config.set_main_option(
+    "sqlalchemy.url",
+    (url or f"{settings.SYNC_DB_DRIVER}{settings.database_url}").replace(
+        "%", "%%"
+    ),
+)
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
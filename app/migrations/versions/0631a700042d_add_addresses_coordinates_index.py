@@ -0,0 +1,33 @@
+"""add addresses coordinates index
+
+Revision ID: 0631a700042d
+Revises: d71c3c368563
+Create Date: 2026-10-18 08:25:29.342960
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0631a700042d'
+down_revision: Union[str, Sequence[str], None] = 'd71c3c368563'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_addresses_latitude_longitude',
+        'addresses',
+        ['latitude', 'longitude'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_addresses_latitude_longitude', table_name='addresses')
@@ -0,0 +1,43 @@
+"""add foreign key and lookup indexes
+
+Revision ID: 2c496734816d
+Revises: b2a88c1d9261
+Create Date: 2026-10-18 09:01:03.793646
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2c496734816d'
+down_revision: Union[str, Sequence[str], None] = 'b2a88c1d9261'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = (
+    ('ix_companies_address_id', 'companies', ['address_id']),
+    ('ix_phone_numbers_company_id', 'phone_numbers', ['company_id']),
+    ('ix_activities_parent_id', 'activities', ['parent_id']),
+    ('ix_activities_name', 'activities', ['name']),
+    (
+        'ix_company_activities_activity_id',
+        'company_activities',
+        ['activity_id'],
+    ),
+    ('ix_addresses_address', 'addresses', ['address']),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,72 @@
+"""add companies name search index
+
+Revision ID: 7d10e0cb7cdc
+Revises: 0631a700042d
+Create Date: 2026-10-18 08:31:45.900411
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d10e0cb7cdc'
+down_revision: Union[str, Sequence[str], None] = '0631a700042d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.create_index(
+            'ix_companies_name_trgm',
+            'companies',
+            ['name'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_ops={'name': 'gin_trgm_ops'},
+        )
+    else:
+        op.execute(
+            "CREATE VIRTUAL TABLE companies_fts USING fts5("
+            "name, content='companies', content_rowid='id', "
+            "tokenize='trigram')"
+        )
+        op.execute(
+            "CREATE TRIGGER companies_fts_ai AFTER INSERT ON companies BEGIN "
+            "INSERT INTO companies_fts(rowid, name) "
+            "VALUES (new.id, new.name); "
+            "END"
+        )
+        op.execute(
+            "CREATE TRIGGER companies_fts_ad AFTER DELETE ON companies BEGIN "
+            "INSERT INTO companies_fts(companies_fts, rowid, name) "
+            "VALUES ('delete', old.id, old.name); "
+            "END"
+        )
+        op.execute(
+            "CREATE TRIGGER companies_fts_au AFTER UPDATE ON companies BEGIN "
+            "INSERT INTO companies_fts(companies_fts, rowid, name) "
+            "VALUES ('delete', old.id, old.name); "
+            "INSERT INTO companies_fts(rowid, name) "
+            "VALUES (new.id, new.name); "
+            "END"
+        )
+        op.execute(
+            "INSERT INTO companies_fts(companies_fts) VALUES ('rebuild')"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_companies_name_trgm', table_name='companies')
+    else:
+        op.execute('DROP TRIGGER companies_fts_au')
+        op.execute('DROP TRIGGER companies_fts_ad')
+        op.execute('DROP TRIGGER companies_fts_ai')
+        op.execute('DROP TABLE companies_fts')
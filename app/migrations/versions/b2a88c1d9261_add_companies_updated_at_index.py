@@ -0,0 +1,33 @@
+"""add companies updated_at index
+
+Revision ID: b2a88c1d9261
+Revises: 7d10e0cb7cdc
+Create Date: 2026-10-18 08:38:50.753269
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2a88c1d9261'
+down_revision: Union[str, Sequence[str], None] = '7d10e0cb7cdc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_companies_updated_at',
+        'companies',
+        ['updated_at'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_companies_updated_at', table_name='companies')
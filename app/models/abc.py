@@ -7,9 +7,9 @@ class BaseModel(DeclarativeBase):
     __abstract__ = True
 
     created_at: Mapped[datetime] = mapped_column(
-        default=datetime.utcnow(),
+        default=datetime.utcnow,
     )
     updated_at: Mapped[datetime] = mapped_column(
-        default=datetime.utcnow(),
-        onupdate=datetime.utcnow(),
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
     )
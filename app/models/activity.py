@@ -1,6 +1,6 @@
 from typing import Optional, Self
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.abc import BaseModel
@@ -9,6 +9,10 @@ from app.models.many_to_many import company_activities
 
 class Activity(BaseModel):
     __tablename__ = "activities"
+    __table_args__ = (
+        Index("ix_activities_name", "name"),
+        Index("ix_activities_parent_id", "parent_id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(nullable=False)
@@ -1,3 +1,4 @@
+from sqlalchemy import Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.abc import BaseModel
@@ -5,6 +6,10 @@ from app.models.abc import BaseModel
 
 class Address(BaseModel):
     __tablename__ = "addresses"
+    __table_args__ = (
+        Index("ix_addresses_address", "address"),
+        Index("ix_addresses_latitude_longitude", "latitude", "longitude"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     address: Mapped[str] = mapped_column(nullable=False)
@@ -1,12 +1,19 @@
-from sqlalchemy import ForeignKey
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from datetime import datetime
+
+from sqlalchemy import ForeignKey, Index, event
+from sqlalchemy.orm import Mapped, Session, mapped_column, relationship
 
 from app.models.abc import BaseModel
 from app.models.many_to_many import company_activities
+from app.models.phone_numbers import PhoneNumber
 
 
 class Company(BaseModel):
     __tablename__ = "companies"
+    __table_args__ = (
+        Index("ix_companies_address_id", "address_id"),
+        Index("ix_companies_updated_at", "updated_at"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(nullable=False)
@@ -25,3 +32,24 @@ class Company(BaseModel):
 
     def __str__(self):
         return f"Company: {self.name}, id: {self.id}"
+
+
+@event.listens_for(Session, "before_flush")
+def touch_changed_companies(session: Session, context, instances) -> None:
+    """Move ``updated_at`` of companies whose phones or activities changed.
+
+    A changed collection alone does not update the company row, so its
+    ``onupdate`` would not run and incremental exports would miss it.
+    """
+    companies = {
+        i
+        for i in session.dirty
+        if isinstance(i, Company) and session.is_modified(i)
+    }
+    for i in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(i, PhoneNumber) and i.company is not None:
+            companies.add(i.company)
+    now = datetime.utcnow()
+    for company in companies:
+        if company not in session.new and company not in session.deleted:
+            company.updated_at = now
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, ForeignKey, Table
+from sqlalchemy import Column, ForeignKey, Index, Table
 
 from app.models.abc import BaseModel
 
@@ -7,4 +7,5 @@ company_activities = Table(  # Company ↔ Activity
     BaseModel.metadata,
     Column("company_id", ForeignKey("companies.id"), primary_key=True),
     Column("activity_id", ForeignKey("activities.id"), primary_key=True),
+    Index("ix_company_activities_activity_id", "activity_id"),
 )
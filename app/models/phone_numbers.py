@@ -1,4 +1,4 @@
-from sqlalchemy import ForeignKey
+from sqlalchemy import ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.abc import BaseModel
@@ -6,6 +6,7 @@ from app.models.abc import BaseModel
 
 class PhoneNumber(BaseModel):
     __tablename__ = "phone_numbers"
+    __table_args__ = (Index("ix_phone_numbers_company_id", "company_id"),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
     number: Mapped[str] = mapped_column(nullable=False)
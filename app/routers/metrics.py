@@ -0,0 +1,19 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.services.metrics import CONTENT_TYPE, registry
+
+metrics_router = APIRouter(tags=["metrics"])
+
+
+@metrics_router.get(
+    path="/metrics",
+    response_class=PlainTextResponse,
+    summary="Метрики в формате Prometheus",
+    description=(
+        "Задержки и статусы запросов по маршрутам, запросы к базе по "
+        "методам SearchService, состояние пула соединений и кэша"
+    ),
+)
+async def get_metrics():
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
@@ -1,22 +1,51 @@
+from contextlib import aclosing
+from datetime import UTC, datetime
 from logging import getLogger
+from typing import Annotated
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, Query, Response
+from fastapi.responses import StreamingResponse
+from pydantic_core import to_json
 from starlette.status import (
     HTTP_200_OK,
+    HTTP_304_NOT_MODIFIED,
     HTTP_400_BAD_REQUEST,
     HTTP_401_UNAUTHORIZED,
     HTTP_404_NOT_FOUND,
     HTTP_422_UNPROCESSABLE_ENTITY,
+    HTTP_429_TOO_MANY_REQUESTS,
     HTTP_500_INTERNAL_SERVER_ERROR,
 )
 
+from app.constants import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 from app.depends.services import get_find_service
-from app.schemas.companies import Companies, Company, SearchCompaniesByGeo
+from app.schemas.activities import ActivityFacets, ActivityFacetsFilter
+from app.schemas.companies import (
+    Companies,
+    CompaniesBatch,
+    CompaniesInViewport,
+    CompaniesSearch,
+    CompaniesWithDistance,
+    Company,
+    GetCompaniesBatch,
+    SearchCompanies,
+    SearchCompaniesByGeo,
+    SearchCompaniesInViewport,
+    SearchNearestCompanies,
+)
+from app.services.errors import BatchTooLargeError, UnexpectedError
 from app.services.search_service import SearchService
+from app.settings import get_current_config
+from app.utils.etag import etag_matches, strong_etag
+from app.utils.responses import ModelResponse
 
 logger = getLogger("build-system")
 
-company_router = APIRouter(prefix="/companies", tags=["companies"])
+company_router = APIRouter(
+    prefix="/companies",
+    tags=["companies"],
+    default_response_class=ModelResponse,
+)
 
 
 responses = {
@@ -27,23 +56,137 @@ responses = {
     HTTP_422_UNPROCESSABLE_ENTITY: {
         "description": "Ошибка валидации входных данных"
     },
+    HTTP_429_TOO_MANY_REQUESTS: {
+        "description": "Превышен лимит запросов для API ключа"
+    },
     HTTP_500_INTERNAL_SERVER_ERROR: {
         "description": "Критическая ошибка логики проекта"
     },
 }
+company_responses = {
+    **responses,
+    HTTP_304_NOT_MODIFIED: {"description": "Компания не изменилась"},
+}
+
+
+@company_router.get(
+    path="/export",
+    response_class=StreamingResponse,
+    summary="Выгрузить все компании в формате NDJSON",
+    description=(
+        "Потоково возвращает компании по одной в строке, отсортированные "
+        "по индификатору. Для продолжения прерванной выгрузки передайте "
+        "индификатор последней полученной компании в after_id. Если "
+        "выгрузка оборвалась из-за ошибки на сервере, последней строкой "
+        'идет {"error": ..., "after_id": ...} с индификатором, с которого '
+        "ее можно продолжить. updated_since без часового пояса считается "
+        "временем UTC. Время изменения компании обновляется и при "
+        "изменении ее телефонов или видов деятельности через ORM, но не "
+        "массовыми update()/insert() в связанные таблицы"
+    ),
+    responses={
+        **responses,
+        HTTP_200_OK: {
+            "description": "Компании в формате NDJSON",
+            "content": {"application/x-ndjson": {}},
+        },
+    },
+)
+async def export_companies(
+    updated_since: datetime | None = Query(
+        None, description="Только компании, измененные с этого момента"
+    ),
+    after_id: int | None = Query(
+        None, ge=0, description="Индификатор последней полученной компании"
+    ),
+    service: SearchService = Depends(get_find_service),
+):
+    if updated_since is not None and updated_since.tzinfo is not None:
+        # updated_at is stored as naive UTC.
+        updated_since = updated_since.astimezone(UTC).replace(tzinfo=None)
+
+    async def lines():
+        # Headers are already sent when the export fails, the error is
+        # reported by a trailing record instead of the status code.
+        last_id = after_id
+        try:
+            async with aclosing(
+                service.export_companies(updated_since, after_id)
+            ) as pages:
+                async for companies in pages:
+                    yield b"".join(
+                        to_json(company) + b"\n" for company in companies
+                    )
+                    if companies:
+                        last_id = companies[-1].id
+        except UnexpectedError as e:
+            yield to_json({"error": e.detail, "after_id": last_id}) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@company_router.get(
+    path="/facets/activities",
+    response_model=ActivityFacets,
+    summary="Количество компаний по видам деятельности",
+    description=(
+        "Возвращает дерево видов деятельности с количеством компаний "
+        "каждого вида, включая вложенные. Можно ограничить радиусом от "
+        "координаты"
+    ),
+    responses=responses,
+)
+async def count_companies_by_activity(
+    filters: Annotated[ActivityFacetsFilter, Query()],
+    service: SearchService = Depends(get_find_service),
+):
+    return ModelResponse(
+        await service.count_companies_by_activity(filters.geo)
+    )
 
 
 @company_router.get(
     path="/{pk}",
     response_model=Company,
     summary="Получить компанию по индификатору",
-    description="Принимает индификатор компании, возвращает компанию",
-    responses=responses,
+    description=(
+        "Принимает индификатор компании, возвращает компанию. "
+        "Поддерживает ETag и If-None-Match"
+    ),
+    responses=company_responses,
 )
 async def get_company_by_id(
-    pk: int, service: SearchService = Depends(get_find_service)
+    pk: int,
+    if_none_match: str | None = Header(None),
+    service: SearchService = Depends(get_find_service),
 ):
-    return await service.find_company_by_id(pk)
+    company = await service.find_company_by_id(pk)
+    etag = strong_etag(company)
+    if etag_matches(if_none_match, etag):
+        return Response(
+            status_code=HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+        )
+    return ModelResponse(company, headers={"ETag": etag})
+
+
+@company_router.post(
+    path="/batch",
+    response_model=CompaniesBatch,
+    summary="Получить несколько компаний по индификаторам",
+    description=(
+        "Принимает список индификаторов, возвращает компании в том же "
+        "порядке. Ненайденные компании отмечены found=false"
+    ),
+    responses=responses,
+)
+async def get_companies_batch(
+    data: GetCompaniesBatch,
+    service: SearchService = Depends(get_find_service),
+):
+    max_size = get_current_config().COMPANY_BATCH_MAX_SIZE
+    if len(data.ids) > max_size:
+        raise BatchTooLargeError(max_size)
+    return ModelResponse(await service.find_companies_by_ids(data.ids))
 
 
 @company_router.get(
@@ -56,7 +199,28 @@ async def get_company_by_id(
 async def get_company_by_name(
     name: str, service: SearchService = Depends(get_find_service)
 ):
-    return await service.find_company_by_name(name)
+    return ModelResponse(await service.find_company_by_name(name))
+
+
+@company_router.get(
+    path="/search/by/name",
+    response_model=Companies,
+    summary="Поиск компаний по имени",
+    description=(
+        "Принимает часть имени компании, возвращает подходящие компании, "
+        "отсортированные по релевантности"
+    ),
+    responses=responses,
+)
+async def search_companies_by_name(
+    name: str = Query(min_length=1, description="Имя или его часть"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = Query(None, description="Курсор next_cursor"),
+    service: SearchService = Depends(get_find_service),
+):
+    return ModelResponse(
+        await service.search_companies_by_name(name, limit, cursor)
+    )
 
 
 @company_router.get(
@@ -67,9 +231,14 @@ async def get_company_by_name(
     responses=responses,
 )
 async def get_companies_by_activity(
-    activity: str, service: SearchService = Depends(get_find_service)
+    activity: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = Query(None, description="Курсор next_cursor"),
+    service: SearchService = Depends(get_find_service),
 ):
-    return await service.find_company_by_activity(activity)
+    return ModelResponse(
+        await service.find_company_by_activity(activity, limit, cursor)
+    )
 
 
 @company_router.get(
@@ -80,14 +249,38 @@ async def get_companies_by_activity(
     responses=responses,
 )
 async def get_companies_by_address(
-    address: str, service: SearchService = Depends(get_find_service)
+    address: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = Query(None, description="Курсор next_cursor"),
+    service: SearchService = Depends(get_find_service),
 ):
-    return await service.find_companies_by_address(address)
+    return ModelResponse(
+        await service.find_companies_by_address(address, limit, cursor)
+    )
+
+
+@company_router.post(
+    path="/search",
+    response_model=CompaniesSearch,
+    summary="Поиск компаний по нескольким условиям",
+    description=(
+        "Принимает необязательные фильтры по имени, виду деятельности с "
+        "вложенными, адресу и радиусу от координаты, возвращает компании, "
+        "подходящие под все фильтры, отсортированные по имени или "
+        "расстоянию"
+    ),
+    responses=responses,
+)
+async def search_companies(
+    data: SearchCompanies,
+    service: SearchService = Depends(get_find_service),
+):
+    return ModelResponse(await service.search_companies(data))
 
 
 @company_router.post(
     path="/search/by/geo/",
-    response_model=Companies,
+    response_model=CompaniesWithDistance,
     summary="Получить ближайшие компании от координаты в радиусе x км.",
     description="Принимает координаты, возвращает все компании в радиусе x км",
     responses=responses,
@@ -96,6 +289,55 @@ async def get_companies_by_geo(
     data: SearchCompaniesByGeo,
     service: SearchService = Depends(get_find_service),
 ):
-    return await service.find_companies_by_geo(
-        data.latitude, data.longitude, data.radius
+    return ModelResponse(
+        await service.find_companies_by_geo(
+            data.latitude, data.longitude, data.radius, data.limit, data.cursor
+        )
+    )
+
+
+@company_router.post(
+    path="/search/by/viewport/",
+    response_model=CompaniesInViewport,
+    summary="Компании или их кластеры в видимой области карты.",
+    description=(
+        "Принимает границы области и масштаб карты. На крупном масштабе "
+        "возвращает компании, если их немного, иначе кластеры с числом "
+        "компаний и центром по ячейкам сетки"
+    ),
+    responses=responses,
+)
+async def get_companies_in_viewport(
+    data: SearchCompaniesInViewport,
+    service: SearchService = Depends(get_find_service),
+):
+    return ModelResponse(
+        await service.find_companies_in_viewport(
+            data.min_latitude,
+            data.min_longitude,
+            data.max_latitude,
+            data.max_longitude,
+            data.zoom,
+        )
+    )
+
+
+@company_router.post(
+    path="/search/nearest/",
+    response_model=CompaniesWithDistance,
+    summary="Получить N ближайших компаний от координаты.",
+    description=(
+        "Принимает координаты, возвращает до N ближайших компаний в "
+        "пределах 1000 км"
+    ),
+    responses=responses,
+)
+async def get_nearest_companies(
+    data: SearchNearestCompanies,
+    service: SearchService = Depends(get_find_service),
+):
+    return ModelResponse(
+        await service.find_nearest_companies(
+            data.latitude, data.longitude, data.limit
+        )
     )
@@ -0,0 +1,52 @@
+from pydantic import BaseModel, Field, model_validator
+
+from app.schemas.companies import GeoCircle
+
+
+class ActivityFacet(BaseModel):
+    id: int
+    name: str
+    count: int = Field(
+        description="Количество компаний с этим или вложенным видом",
+    )
+    children: list["ActivityFacet"] = Field(
+        default=[],
+        description="Вложенные виды деятельности",
+    )
+
+
+class ActivityFacets(BaseModel):
+    activities: list[ActivityFacet] = Field(
+        description="Дерево видов деятельности с количеством компаний",
+    )
+
+
+class ActivityFacetsFilter(BaseModel):
+    latitude: float | None = Field(
+        default=None, ge=-90, le=90, description="Широта от -90 до 90"
+    )
+    longitude: float | None = Field(
+        default=None, ge=-180, le=180, description="Долгота от -180 до 180"
+    )
+    radius: int | None = Field(
+        default=None, ge=1, le=100, description="Радиус от 1 до 100 км"
+    )
+
+    @model_validator(mode="after")
+    def check_geo(self) -> "ActivityFacetsFilter":
+        values = (self.latitude, self.longitude, self.radius)
+        if any(i is None for i in values) and any(
+            i is not None for i in values
+        ):
+            raise ValueError("latitude, longitude and radius go together")
+        return self
+
+    @property
+    def geo(self) -> GeoCircle | None:
+        if self.radius is None:
+            return None
+        return GeoCircle(
+            latitude=self.latitude,
+            longitude=self.longitude,
+            radius=self.radius,
+        )
@@ -1,4 +1,7 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
+
+from app.constants import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.utils.enum import CompanySort
 
 
 class Company(BaseModel):
@@ -13,17 +16,186 @@ class Company(BaseModel):
 
 class Companies(BaseModel):
     companies: list[Company]
+    next_cursor: str | None = Field(
+        default=None,
+        description="Курсор следующей страницы, если она есть",
+    )
+
+
+class CompanyBatchItem(BaseModel):
+    id: int
+    found: bool
+    company: Company | None = Field(
+        default=None,
+        description="Компания, если она найдена",
+    )
+
+
+class CompaniesBatch(BaseModel):
+    companies: list[CompanyBatchItem] = Field(
+        description="Результаты в порядке запрошенных индификаторов",
+    )
+
+
+class GetCompaniesBatch(BaseModel):
+    ids: list[int] = Field(
+        min_length=1,
+        description="Индификаторы компаний",
+    )
 
 
-class SearchCompaniesByGeo(BaseModel):
+class CompanyWithDistance(Company):
+    distance: float = Field(description="Расстояние до точки поиска в км")
+
+
+class CompaniesWithDistance(BaseModel):
+    companies: list[CompanyWithDistance]
+    next_cursor: str | None = Field(
+        default=None,
+        description="Курсор следующей страницы, если она есть",
+    )
+
+
+class GeoPoint(BaseModel):
     latitude: float = Field(ge=-90, le=90, description="Широта от -90 до 90")
     longitude: float = Field(
         ge=-180,
         le=180,
         description="Долгота от -180 до 180",
     )
+
+
+class GeoCircle(GeoPoint):
     radius: int = Field(
         ge=1,
         le=100,
         description="Радиус поиска от 1 до 100 км",
     )
+
+
+class SearchCompaniesByGeo(GeoCircle):
+    limit: int = Field(
+        default=DEFAULT_PAGE_SIZE,
+        ge=1,
+        le=MAX_PAGE_SIZE,
+        description=f"Размер страницы от 1 до {MAX_PAGE_SIZE}",
+    )
+    cursor: str | None = Field(
+        default=None,
+        description="Курсор из next_cursor предыдущей страницы",
+    )
+
+
+class SearchNearestCompanies(GeoPoint):
+    limit: int = Field(
+        ge=1,
+        le=100,
+        description="Количество ближайших компаний от 1 до 100",
+    )
+
+
+class CompanySearchItem(Company):
+    distance: float | None = Field(
+        default=None,
+        description="Расстояние до точки поиска в км, если она задана",
+    )
+
+
+class CompaniesSearch(BaseModel):
+    companies: list[CompanySearchItem]
+    next_cursor: str | None = Field(
+        default=None,
+        description="Курсор следующей страницы, если она есть",
+    )
+
+
+class SearchCompanies(BaseModel):
+    name: str | None = Field(
+        default=None,
+        min_length=1,
+        description="Имя компании или его часть",
+    )
+    activity: str | None = Field(
+        default=None,
+        min_length=1,
+        description="Вид деятельности, включая вложенные",
+    )
+    address: str | None = Field(
+        default=None,
+        min_length=1,
+        description="Адрес или его часть",
+    )
+    geo: GeoCircle | None = Field(
+        default=None,
+        description="Только компании в радиусе от точки",
+    )
+    sort_by: CompanySort | None = Field(
+        default=None,
+        description=(
+            "Сортировка по имени или по расстоянию, по умолчанию по "
+            "расстоянию, если задан geo"
+        ),
+    )
+    limit: int = Field(
+        default=DEFAULT_PAGE_SIZE,
+        ge=1,
+        le=MAX_PAGE_SIZE,
+        description=f"Размер страницы от 1 до {MAX_PAGE_SIZE}",
+    )
+    cursor: str | None = Field(
+        default=None,
+        description="Курсор из next_cursor предыдущей страницы",
+    )
+
+    @model_validator(mode="after")
+    def check_sort(self) -> "SearchCompanies":
+        if self.sort_by is None:
+            self.sort_by = (
+                CompanySort.NAME if self.geo is None else CompanySort.DISTANCE
+            )
+        elif self.sort_by == CompanySort.DISTANCE and self.geo is None:
+            raise ValueError("Sorting by distance requires geo")
+        return self
+
+
+class SearchCompaniesInViewport(BaseModel):
+    min_latitude: float = Field(ge=-90, le=90, description="Южная граница")
+    min_longitude: float = Field(
+        ge=-180,
+        le=180,
+        description="Западная граница, больше восточной через 180-й меридиан",
+    )
+    max_latitude: float = Field(ge=-90, le=90, description="Северная граница")
+    max_longitude: float = Field(
+        ge=-180,
+        le=180,
+        description="Восточная граница",
+    )
+    zoom: int = Field(ge=0, le=22, description="Масштаб карты от 0 до 22")
+
+    @model_validator(mode="after")
+    def check_latitudes(self) -> "SearchCompaniesInViewport":
+        if self.min_latitude > self.max_latitude:
+            raise ValueError("min_latitude must not exceed max_latitude")
+        return self
+
+
+class CompanyCluster(BaseModel):
+    latitude: float = Field(description="Широта центра компаний ячейки")
+    longitude: float = Field(description="Долгота центра компаний ячейки")
+    count: int = Field(description="Количество компаний в ячейке")
+
+
+class CompaniesInViewport(BaseModel):
+    companies: list[Company] = Field(
+        default=[],
+        description="Компании, если масштаб крупный и их немного",
+    )
+    clusters: list[CompanyCluster] = Field(
+        default=[],
+        description="Кластеры компаний по ячейкам сетки иначе",
+    )
+    cell_size: float | None = Field(
+        default=None,
+        description="Размер ячейки сетки кластеров в градусах",
+    )
@@ -1,11 +1,32 @@
+import hashlib
+from functools import lru_cache
+
 from fastapi import Header
 
-from app.services.errors import UnauthorizedError
+from app.services.errors import TooManyRequestsError, UnauthorizedError
+from app.services.rate_limit import get_rate_limiter
 from app.settings import get_current_config
 
 
-async def authorized_by_api_token(x_api_key: str = Header(...)):
+def hash_api_key(key: str) -> str:
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+@lru_cache
+def get_api_key_hashes() -> frozenset[str]:
+    """Hashes of every accepted key: ``API_KEY_HASHES`` and ``AUTH_TOKEN``."""
     config = get_current_config()
-    if x_api_key != config.AUTH_TOKEN:
+    hashes = set(config.API_KEY_HASHES)
+    if config.AUTH_TOKEN:
+        hashes.add(hash_api_key(config.AUTH_TOKEN))
+    return frozenset(hashes)
+
+
+async def authorized_by_api_token(x_api_key: str = Header(...)):
+    key_hash = hash_api_key(x_api_key)
+    if key_hash not in get_api_key_hashes():
         raise UnauthorizedError
+    rate_limiter = get_rate_limiter()
+    if rate_limiter is not None and not rate_limiter.allow(key_hash):
+        raise TooManyRequestsError(rate_limiter.retry_after(key_hash))
     return x_api_key
@@ -0,0 +1,128 @@
+import math
+import time
+from collections import OrderedDict
+from logging import getLogger
+from typing import Generic, Hashable, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from app.models import Activity, Address, Company, PhoneNumber
+from app.services.metrics import Callback, registry
+from app.settings import get_current_config
+
+logger = getLogger("build-system")
+
+V = TypeVar("V")
+
+
+class LRUCache(Generic[V]):
+    """Bounded LRU cache whose entries expire ``ttl`` seconds after set."""
+
+    def __init__(self, max_size: int, ttl: float | None = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[float, V]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> V | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: V) -> None:
+        if self.max_size <= 0:
+            return
+        expires_at = math.inf
+        if self.ttl is not None:
+            expires_at = time.monotonic() + self.ttl
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+_company_cache: LRUCache | None = None
+
+
+def get_company_cache() -> LRUCache | None:
+    """Shared company by id cache or None if ``COMPANY_CACHE_SIZE`` is 0."""
+    global _company_cache
+    if _company_cache is None:
+        config = get_current_config()
+        if config.COMPANY_CACHE_SIZE <= 0:
+            return None
+        _company_cache = LRUCache(
+            config.COMPANY_CACHE_SIZE, config.COMPANY_CACHE_TTL
+        )
+    return _company_cache
+
+
+def _company_cache_stats() -> list[tuple[tuple, float]]:
+    if _company_cache is None:
+        return []
+    return [
+        (("hit",), _company_cache.hits),
+        (("miss",), _company_cache.misses),
+    ]
+
+
+registry.register(
+    Callback(
+        "company_cache_requests_total",
+        "Company by id cache lookups by result.",
+        _company_cache_stats,
+        ("result",),
+        type="counter",
+    )
+)
+
+
+def invalidate_company(pk: int) -> None:
+    if _company_cache is not None:
+        _company_cache.invalidate(pk)
+
+
+def clear_company_cache(*args) -> None:
+    if _company_cache is not None:
+        _company_cache.clear()
+
+
+def invalidate_company_on_change(mapper, connection, target) -> None:
+    if isinstance(target, Company):
+        invalidate_company(target.id)
+    elif isinstance(target, PhoneNumber):
+        invalidate_company(target.company_id)
+
+
+def clear_company_cache_on_bulk(state: ORMExecuteState) -> None:
+    if not state.is_select:
+        clear_company_cache()
+
+
+for name in ("after_insert", "after_update", "after_delete"):
+    event.listen(Company, name, invalidate_company_on_change)
+    event.listen(PhoneNumber, name, invalidate_company_on_change)
+    # Shared by many companies, rare enough to drop everything.
+    event.listen(Address, name, clear_company_cache)
+    event.listen(Activity, name, clear_company_cache)
+event.listen(Session, "do_orm_execute", clear_company_cache_on_bulk)
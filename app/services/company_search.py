@@ -0,0 +1,194 @@
+import math
+from functools import lru_cache
+from typing import Any, NamedTuple
+
+from sqlalchemy import (
+    Float,
+    Integer,
+    Select,
+    String,
+    bindparam,
+    literal,
+    select,
+    tuple_,
+)
+
+from app.constants import ACTIVITY_TREE_DEPTH
+from app.models import Activity, company_activities
+from app.models.address import Address
+from app.models.company import Company
+from app.schemas.companies import SearchCompanies
+from app.services.geo import bounding_box, distance_km, within_ranges
+from app.services.pagination import decode_cursor
+from app.services.projection import company_projection
+from app.utils.enum import CompanySort
+
+
+class SearchShape(NamedTuple):
+    """Filters set in a combined search, one statement per shape.
+
+    ``activity_ids`` tells that the activity subtree is given as a list of
+    ids, otherwise it is resolved in the statement. ``longitude_ranges``
+    is the number of longitude ranges of the geo bounding box, None
+    without the geo filter.
+    """
+
+    name: bool = False
+    activity: bool = False
+    activity_ids: bool = False
+    address: bool = False
+    longitude_ranges: int | None = None
+    sort_by: CompanySort = CompanySort.NAME
+    cursor: bool = False
+
+
+def activity_subtree(
+    activity: Any,
+    level: int = ACTIVITY_TREE_DEPTH,
+) -> Select:
+    """Ids of the activity and its descendants down to ``level``.
+
+    Resolved in the database with one recursive CTE, the depth limit is
+    a condition of its recursive part.
+    """
+    tree = (
+        select(Activity.id, literal(0).label("depth"))
+        .where(Activity.name == activity)
+        .cte("activity_tree", recursive=True)
+    )
+    tree = tree.union_all(
+        select(Activity.id, tree.c.depth + 1)
+        .join(tree, Activity.parent_id == tree.c.id)
+        .where(tree.c.depth < level)
+    )
+    return select(tree.c.id)
+
+
+@lru_cache(maxsize=None)
+def search_statement(shape: SearchShape) -> Select:
+    """Combined search of the ``shape`` with bound parameters.
+
+    Built once per shape, so its cache key is computed once and SQLAlchemy
+    finds the compiled SQL in the engine cache on every later execution.
+    The parameters are made by ``search_parameters``.
+    """
+    columns, conditions = [], []
+    if shape.longitude_ranges is not None:
+        distance = distance_km(
+            bindparam("lat", type_=Float),
+            bindparam("long", type_=Float),
+            bindparam("cos_lat", type_=Float),
+        )
+        columns.append(distance.label("distance"))
+        longitude_ranges = [
+            (
+                bindparam(f"min_long_{i}", type_=Float),
+                bindparam(f"max_long_{i}", type_=Float),
+            )
+            for i in range(shape.longitude_ranges)
+        ]
+        conditions += [
+            within_ranges(
+                bindparam("min_lat", type_=Float),
+                bindparam("max_lat", type_=Float),
+                longitude_ranges,
+            ),
+            distance <= bindparam("radius", type_=Float),
+        ]
+    if shape.name:
+        conditions.append(Company.name.ilike(bindparam("name", type_=String)))
+    if shape.address:
+        conditions.append(
+            Address.address.ilike(bindparam("address", type_=String))
+        )
+    if shape.activity:
+        if shape.activity_ids:
+            activity_ids = bindparam(
+                "activity_ids", type_=Integer, expanding=True
+            )
+        else:
+            activity_ids = activity_subtree(
+                bindparam("activity", type_=String)
+            )
+        conditions.append(
+            Company.id.in_(
+                select(company_activities.c.company_id).where(
+                    company_activities.c.activity_id.in_(activity_ids)
+                )
+            )
+        )
+
+    if shape.sort_by == CompanySort.DISTANCE:
+        sort_key, key_type = distance, Float
+    else:
+        sort_key, key_type = Company.name, String
+    if shape.cursor:
+        conditions.append(
+            tuple_(sort_key, Company.id)
+            > tuple_(
+                bindparam("cursor_key", type_=key_type),
+                bindparam("cursor_id", type_=Integer),
+            )
+        )
+    return (
+        company_projection(*columns)
+        .where(*conditions)
+        .order_by(sort_key, Company.id)
+        .limit(bindparam("limit", type_=Integer))
+    )
+
+
+def search_parameters(
+    filters: SearchCompanies,
+    activity_ids: list[int] | None = None,
+) -> tuple[SearchShape, dict[str, Any]]:
+    """Shape of the search and parameters of its statement.
+
+    ``activity_ids`` is the activity subtree if it is already known, e.g.
+    from the taxonomy.
+    """
+    parameters: dict[str, Any] = {"limit": filters.limit + 1}
+    if filters.name is not None:
+        parameters["name"] = f"%{filters.name}%"
+    if filters.address is not None:
+        parameters["address"] = f"%{filters.address}%"
+    if activity_ids is not None:
+        parameters["activity_ids"] = activity_ids
+    elif filters.activity is not None:
+        parameters["activity"] = filters.activity
+
+    longitude_ranges = None
+    if filters.geo is not None:
+        lat, long = filters.geo.latitude, filters.geo.longitude
+        min_lat, max_lat, ranges = bounding_box(lat, long, filters.geo.radius)
+        longitude_ranges = len(ranges)
+        parameters.update(
+            lat=lat,
+            long=long,
+            cos_lat=math.cos(math.radians(lat)),
+            radius=filters.geo.radius,
+            min_lat=min_lat,
+            max_lat=max_lat,
+        )
+        for i, (min_long, max_long) in enumerate(ranges):
+            parameters[f"min_long_{i}"] = min_long
+            parameters[f"max_long_{i}"] = max_long
+
+    if filters.cursor is not None:
+        key_types = (int, float)
+        if filters.sort_by == CompanySort.NAME:
+            key_types = (str,)
+        parameters["cursor_key"], parameters["cursor_id"] = decode_cursor(
+            filters.cursor, 2, [key_types, (int,)]
+        )
+
+    shape = SearchShape(
+        name=filters.name is not None,
+        activity=filters.activity is not None,
+        activity_ids=activity_ids is not None,
+        address=filters.address is not None,
+        longitude_ranges=longitude_ranges,
+        sort_by=filters.sort_by,
+        cursor=filters.cursor is not None,
+    )
+    return shape, parameters
@@ -1,7 +1,10 @@
 from fastapi import HTTPException
 from starlette.status import (
+    HTTP_400_BAD_REQUEST,
     HTTP_401_UNAUTHORIZED,
     HTTP_404_NOT_FOUND,
+    HTTP_422_UNPROCESSABLE_ENTITY,
+    HTTP_429_TOO_MANY_REQUESTS,
     HTTP_500_INTERNAL_SERVER_ERROR,
 )
 
@@ -28,3 +31,28 @@ class CompanyNotFoundError(HTTPException):
             status_code=HTTP_404_NOT_FOUND,
             detail="Company not found",
         )
+
+
+class InvalidCursorError(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor",
+        )
+
+
+class BatchTooLargeError(HTTPException):
+    def __init__(self, max_size: int):
+        super().__init__(
+            status_code=HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Batch size must not exceed {max_size}",
+        )
+
+
+class TooManyRequestsError(HTTPException):
+    def __init__(self, retry_after: int):
+        super().__init__(
+            status_code=HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests. Slow down.",
+            headers={"Retry-After": str(retry_after)},
+        )
@@ -0,0 +1,203 @@
+import asyncio
+import time
+from collections import defaultdict
+from collections.abc import Callable
+from logging import getLogger
+
+from sqlalchemy import Select, event, func, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import ORMExecuteState, Session, attributes
+
+from app.connectors.sql import get_async_read_session_factory
+from app.constants import ACTIVITY_TREE_DEPTH
+from app.models import Activity, Address, Company, company_activities
+from app.schemas.activities import ActivityFacet as ActivityFacetSchema
+from app.schemas.companies import GeoCircle
+from app.services.geo import distance_km, within_bounding_box
+from app.settings import get_current_config
+
+logger = getLogger("build-system")
+
+
+def activity_counts(
+    geo: GeoCircle | None = None,
+    depth: int = ACTIVITY_TREE_DEPTH,
+) -> Select:
+    """Every activity with the number of its companies, descendants too.
+
+    One statement: a recursive CTE pairs each activity with its
+    descendants down to ``depth`` levels, the pairs are joined with the
+    links and distinct companies are counted per ancestor. Rows are
+    ``(id, parent_id, name, count)`` ordered by id.
+    """
+    closure = select(
+        Activity.id.label("ancestor_id"),
+        Activity.id.label("activity_id"),
+        literal(0).label("depth"),
+    ).cte("activity_closure", recursive=True)
+    closure = closure.union_all(
+        select(closure.c.ancestor_id, Activity.id, closure.c.depth + 1)
+        .join(closure, Activity.parent_id == closure.c.activity_id)
+        .where(closure.c.depth < depth)
+    )
+    counts = select(
+        closure.c.ancestor_id,
+        func.count(company_activities.c.company_id.distinct()).label("count"),
+    ).join(
+        company_activities,
+        company_activities.c.activity_id == closure.c.activity_id,
+    )
+    if geo is not None:
+        distance = distance_km(geo.latitude, geo.longitude)
+        nearby = (
+            select(Company.id)
+            .join(Address)
+            .where(
+                within_bounding_box(geo.latitude, geo.longitude, geo.radius),
+                distance <= geo.radius,
+            )
+        )
+        counts = counts.where(company_activities.c.company_id.in_(nearby))
+    counts = counts.group_by(closure.c.ancestor_id).subquery()
+    return (
+        select(
+            Activity.id,
+            Activity.parent_id,
+            Activity.name,
+            func.coalesce(counts.c.count, 0).label("count"),
+        )
+        .outerjoin(counts, counts.c.ancestor_id == Activity.id)
+        .order_by(Activity.id)
+    )
+
+
+def facet_tree(rows) -> list[ActivityFacetSchema]:
+    """Root facets with nested children from ``activity_counts`` rows."""
+    children = defaultdict(list)
+    for pk, parent_id, name, count in rows:
+        children[parent_id].append((pk, name, count))
+
+    def build(parent_id: int | None) -> list[ActivityFacetSchema]:
+        return [
+            ActivityFacetSchema(
+                id=pk, name=name, count=count, children=build(pk)
+            )
+            for pk, name, count in children[parent_id]
+        ]
+
+    return build(None)
+
+
+class ActivityFacets:
+    """In-memory rollup of company counts over the activity tree.
+
+    Built with one ``activity_counts`` statement on first use. Local
+    changes of links and activities mark it stale through session events,
+    changes made by other workers after ``ttl`` seconds. A stale tree is
+    still served while a background task rebuilds it on a session from
+    ``session_factory``, so only the first request waits for the rollup.
+    """
+
+    def __init__(
+        self,
+        ttl: float | None = None,
+        session_factory: Callable[
+            [], AsyncSession
+        ] = get_async_read_session_factory,
+    ):
+        self.ttl = ttl
+        self.session_factory = session_factory
+        self.built_at: float | None = None
+        self.rebuilding: asyncio.Task | None = None
+        self._stale = True
+        self._lock = asyncio.Lock()
+        self._tree: list[ActivityFacetSchema] | None = None
+
+    @property
+    def is_stale(self) -> bool:
+        if self._stale or self.built_at is None:
+            return True
+        return (
+            self.ttl is not None
+            and time.monotonic() - self.built_at > self.ttl
+        )
+
+    def invalidate(self) -> None:
+        self._stale = True
+
+    async def tree(self, session: AsyncSession) -> list[ActivityFacetSchema]:
+        """Current tree, ``session`` builds it if there is none yet."""
+        if self._tree is None:
+            async with self._lock:
+                if self._tree is None:  # Not built by a concurrent request.
+                    await self.__build(session)
+        elif self.is_stale and self.rebuilding is None:
+            self.rebuilding = asyncio.create_task(self.__rebuild())
+        return self._tree
+
+    async def __rebuild(self) -> None:
+        try:
+            async with self._lock, self.session_factory() as session:
+                await self.__build(session)
+        except Exception as e:
+            logger.exception(e)
+        finally:
+            self.rebuilding = None
+
+    async def __build(self, session: AsyncSession) -> None:
+        # Changes during the build leave it stale.
+        self._stale = False
+        try:
+            result = await session.execute(activity_counts())
+        except BaseException:
+            self._stale = True
+            raise
+        self._tree = facet_tree(result.all())
+        self.built_at = time.monotonic()
+        logger.info("Activity facets rebuilt")
+
+
+_activity_facets: ActivityFacets | None = None
+
+
+def get_activity_facets() -> ActivityFacets:
+    global _activity_facets
+    if _activity_facets is None:
+        config = get_current_config()
+        _activity_facets = ActivityFacets(config.ACTIVITY_FACETS_TTL)
+    return _activity_facets
+
+
+def invalidate_activity_facets(*args) -> None:
+    if _activity_facets is not None:
+        _activity_facets.invalidate()
+
+
+def invalidate_activity_facets_on_flush(session: Session, context) -> None:
+    # Link changes are flushed as rows of the secondary table, with no
+    # mapper events, the pre-flush state still shows the objects.
+    for i in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(i, Activity) or (
+            isinstance(i, Company)
+            and (
+                i in session.deleted
+                or attributes.get_history(i, "activities").has_changes()
+            )
+        ):
+            invalidate_activity_facets()
+            return
+
+
+def invalidate_activity_facets_on_bulk(state: ORMExecuteState) -> None:
+    if state.is_select:
+        return
+    # ORM statements hold annotated copies of the tables, names match.
+    table = getattr(getattr(state.statement, "table", None), "name", None)
+    if table in (company_activities.name, Activity.__tablename__) or (
+        state.is_delete and table == Company.__tablename__
+    ):
+        invalidate_activity_facets()
+
+
+event.listen(Session, "after_flush", invalidate_activity_facets_on_flush)
+event.listen(Session, "do_orm_execute", invalidate_activity_facets_on_bulk)
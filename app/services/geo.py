@@ -0,0 +1,105 @@
+import math
+
+from sqlalchemy import ColumnElement, and_, between, func, or_
+
+from app.constants import EARTH_RADIUS
+from app.models.address import Address
+
+
+def distance_km(
+    lat: float | ColumnElement[float],
+    long: float | ColumnElement[float],
+    cos_lat: float | ColumnElement[float] | None = None,
+) -> ColumnElement[float]:
+    """Haversine distance in km between the point and ``Address``.
+
+    The point may be given as bound parameters, then ``cos_lat`` is the
+    bound cosine of its latitude, otherwise it is computed here.
+    """
+    if cos_lat is None:
+        cos_lat = math.cos(math.radians(lat))
+    half_lat = func.radians(Address.latitude - lat) / 2
+    half_long = func.radians(Address.longitude - long) / 2
+    return (
+        2
+        * EARTH_RADIUS
+        * func.asin(
+            func.sqrt(
+                func.power(func.sin(half_lat), 2)
+                + cos_lat
+                * func.cos(func.radians(Address.latitude))
+                * func.power(func.sin(half_long), 2)
+            )
+        )
+    )
+
+
+def bounding_box(
+    lat: float,
+    long: float,
+    radius_km: float,
+) -> tuple[float, float, list[tuple[float, float]]]:
+    """Smallest lat/long rectangle containing the circle.
+
+    Returns the latitude range and the longitude ranges: none near the
+    poles where the box spans all longitudes, two across the antimeridian
+    and one otherwise.
+    """
+    angular_radius = radius_km / EARTH_RADIUS
+    delta_lat = math.degrees(angular_radius)
+    min_lat, max_lat = lat - delta_lat, lat + delta_lat
+    if min_lat <= -90 or max_lat >= 90:
+        return min_lat, max_lat, []
+
+    delta_long = math.degrees(
+        math.asin(math.sin(angular_radius) / math.cos(math.radians(lat)))
+    )
+    min_long, max_long = long - delta_long, long + delta_long
+    if min_long < -180:
+        return min_lat, max_lat, [(min_long + 360, 180), (-180, max_long)]
+    if max_long > 180:
+        return min_lat, max_lat, [(min_long, 180), (-180, max_long - 360)]
+    return min_lat, max_lat, [(min_long, max_long)]
+
+
+def within_ranges(
+    min_lat: float | ColumnElement[float],
+    max_lat: float | ColumnElement[float],
+    longitude_ranges: list[tuple],
+) -> ColumnElement[bool]:
+    """``Address`` inside the ranges of a ``bounding_box``."""
+    latitude_range = between(Address.latitude, min_lat, max_lat)
+    if not longitude_ranges:
+        return latitude_range
+    return and_(
+        latitude_range,
+        or_(
+            *(
+                between(Address.longitude, min_long, max_long)
+                for min_long, max_long in longitude_ranges
+            )
+        ),
+    )
+
+
+def within_bounding_box(
+    lat: float,
+    long: float,
+    radius_km: float,
+) -> ColumnElement[bool]:
+    """Cheap index friendly prefilter for ``distance_km(...) <= radius_km``."""
+    return within_ranges(*bounding_box(lat, long, radius_km))
+
+
+def viewport_cell_size(zoom: int, span: float, max_cells: int) -> float:
+    """Side in degrees of the cells clustering a viewport at ``zoom``.
+
+    Four cells per 256 px map tile, doubled while the ``span`` of the
+    viewport in degrees is more than ``max_cells`` cells. Cells are a
+    power of two fraction of 360 degrees, so they stay aligned with tiles
+    while the map is moved.
+    """
+    cell = 360 / 2 ** (zoom + 2)
+    while span / cell > max_cells and cell < 360:
+        cell *= 2
+    return cell
@@ -0,0 +1,224 @@
+import asyncio
+import math
+import time
+from collections.abc import Callable
+from logging import getLogger
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from app.connectors.sql import get_async_read_session_factory
+from app.constants import EARTH_RADIUS
+from app.models.address import Address
+from app.models.company import Company
+from app.settings import get_current_config
+
+try:
+    import numpy as np
+except ImportError:  # Optional, only needed with GEO_ENGINE_ENABLED.
+    np = None
+
+logger = getLogger("build-system")
+
+# Initial half-height in degrees of the latitude band for nearest search.
+NEAREST_INITIAL_BAND = 0.5
+
+
+class GeoEngine:
+    """In-memory index of company coordinates for vectorized geo search.
+
+    Every company is stored as a unit vector on the sphere, sorted by
+    latitude. A query only looks at the latitude band that can contain
+    matches (found with a binary search) and computes great-circle
+    distances for it in one NumPy operation.
+
+    Only the first load blocks queries, see ``ready``. A stale index keeps
+    answering while a background task reloads it on a session from
+    ``session_factory``.
+    """
+
+    def __init__(
+        self,
+        refresh_interval: float | None = None,
+        session_factory: Callable[
+            [], AsyncSession
+        ] = get_async_read_session_factory,
+    ):
+        self.refresh_interval = refresh_interval
+        self.session_factory = session_factory
+        self.loaded_at: float | None = None
+        self.refreshing: asyncio.Task | None = None
+        self._stale = True
+        self._lock = asyncio.Lock()
+        self._ids = np.empty(0, dtype=np.int64)
+        self._latitudes = np.empty(0, dtype=np.float64)
+        self._vectors = np.empty((0, 3), dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @property
+    def is_stale(self) -> bool:
+        if self._stale or self.loaded_at is None:
+            return True
+        return (
+            self.refresh_interval is not None
+            and time.monotonic() - self.loaded_at > self.refresh_interval
+        )
+
+    def invalidate(self) -> None:
+        self._stale = True
+
+    async def ready(self, session: AsyncSession) -> None:
+        """Load with ``session`` on first use, later reload in background."""
+        if self.loaded_at is None:
+            await self.refresh(session)
+        elif self.is_stale and self.refreshing is None:
+            self.refreshing = asyncio.create_task(
+                self.__refresh_in_background()
+            )
+
+    async def refresh(self, session: AsyncSession) -> None:
+        async with self._lock:
+            if not self.is_stale:  # Refreshed by a concurrent request.
+                return
+            # Changes during the reload leave it stale.
+            self._stale = False
+            stmt = select(
+                Company.id, Address.latitude, Address.longitude
+            ).join(Address)
+            try:
+                result = await session.execute(stmt)
+            except BaseException:
+                self._stale = True
+                raise
+            self.__index(result.all())
+
+    async def __refresh_in_background(self) -> None:
+        try:
+            async with self.session_factory() as session:
+                await self.refresh(session)
+        except Exception as e:
+            logger.exception(e)
+        finally:
+            self.refreshing = None
+
+    def load(self, rows) -> None:
+        """Rebuild the index from ``(company_id, latitude, longitude)``."""
+        self._stale = False
+        self.__index(rows)
+
+    def __index(self, rows) -> None:
+        # No await in between, queries see the old or the new arrays.
+        data = np.array(rows, dtype=np.float64).reshape(-1, 3)
+        order = np.argsort(data[:, 1], kind="stable")
+        data = data[order]
+        self._ids = data[:, 0].astype(np.int64)
+        self._latitudes = data[:, 1]
+        self._vectors = _unit_vectors(data[:, 1], data[:, 2])
+        self.loaded_at = time.monotonic()
+        logger.info(f"Geo engine loaded {len(self._ids)} companies")
+
+    def within_radius(
+        self,
+        lat: float,
+        long: float,
+        radius_km: float,
+    ) -> list[tuple[int, float]]:
+        """Company ids with distances in km, nearest first."""
+        band = math.degrees(radius_km / EARTH_RADIUS)
+        ids, distances = self.__band_distances(lat, long, band)
+        mask = distances <= radius_km
+        return _sorted_pairs(ids[mask], distances[mask])
+
+    def nearest(
+        self,
+        lat: float,
+        long: float,
+        limit: int,
+    ) -> list[tuple[int, float]]:
+        """The ``limit`` closest company ids with distances in km."""
+        band = NEAREST_INITIAL_BAND
+        while True:
+            ids, distances = self.__band_distances(lat, long, band)
+            # Everything outside the band is at least ``band`` away.
+            reach = EARTH_RADIUS * math.radians(band)
+            if len(ids) >= limit:
+                kth = np.partition(distances, limit - 1)[limit - 1]
+                if kth <= reach:
+                    break
+            if band >= 180:
+                break
+            band *= 2
+        if len(ids) > limit:
+            closest = np.argpartition(distances, limit - 1)[:limit]
+            ids, distances = ids[closest], distances[closest]
+        return _sorted_pairs(ids, distances)
+
+    def __band_distances(self, lat: float, long: float, band: float):
+        start = np.searchsorted(self._latitudes, lat - band, side="left")
+        stop = np.searchsorted(self._latitudes, lat + band, side="right")
+        point = _unit_vectors(np.array([lat]), np.array([long]))[0]
+        dots = np.clip(self._vectors[start:stop] @ point, -1.0, 1.0)
+        return self._ids[start:stop], EARTH_RADIUS * np.arccos(dots)
+
+
+def _unit_vectors(latitudes, longitudes):
+    lat = np.radians(latitudes)
+    long = np.radians(longitudes)
+    cos_lat = np.cos(lat)
+    return np.column_stack(
+        (cos_lat * np.cos(long), cos_lat * np.sin(long), np.sin(lat))
+    )
+
+
+def _sorted_pairs(ids, distances) -> list[tuple[int, float]]:
+    order = np.lexsort((ids, distances))
+    return list(zip(ids[order].tolist(), distances[order].tolist()))
+
+
+_geo_engine: GeoEngine | None = None
+
+
+def get_geo_engine() -> GeoEngine | None:
+    """Shared engine if ``GEO_ENGINE_ENABLED`` and NumPy is installed."""
+    global _geo_engine
+    if _geo_engine is None:
+        config = get_current_config()
+        if not config.GEO_ENGINE_ENABLED:
+            return None
+        if np is None:
+            logger.warning("GEO_ENGINE_ENABLED is set but NumPy is missing")
+            return None
+        _geo_engine = GeoEngine(config.GEO_ENGINE_REFRESH_INTERVAL)
+    return _geo_engine
+
+
+def invalidate_geo_engine(*args) -> None:
+    if _geo_engine is not None:
+        _geo_engine.invalidate()
+
+
+def invalidate_geo_engine_on_update(mapper, connection, target) -> None:
+    # Only moves matter, not e.g. names or the updated_at touch.
+    fields = ("address_id",) if isinstance(target, Company) else ()
+    if isinstance(target, Address):
+        fields = ("latitude", "longitude")
+    state = inspect(target)
+    if any(state.attrs[i].history.has_changes() for i in fields):
+        invalidate_geo_engine()
+
+
+def invalidate_geo_engine_on_bulk(state: ORMExecuteState) -> None:
+    if state.is_select or state.bind_mapper is None:
+        return
+    if state.bind_mapper.class_ in (Company, Address):
+        invalidate_geo_engine()
+
+
+for model in (Company, Address):
+    for name in ("after_insert", "after_delete"):
+        event.listen(model, name, invalidate_geo_engine)
+    event.listen(model, "after_update", invalidate_geo_engine_on_update)
+event.listen(Session, "do_orm_execute", invalidate_geo_engine_on_bulk)
@@ -0,0 +1,289 @@
+import csv
+import time
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import islice
+from logging import getLogger
+from pathlib import Path
+
+from sqlalchemy import delete, insert, or_, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.constants import IMPORT_CHUNK_SIZE, IMPORT_LIST_SEPARATOR
+from app.models import (
+    Activity,
+    Address,
+    Company,
+    PhoneNumber,
+    company_activities,
+)
+from app.schemas.companies import Company as CompanySchema
+
+logger = getLogger("build-system")
+
+
+@dataclass
+class ImportReport:
+    rows: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+class CompanyImporter:
+    """Chunked bulk import of companies in the format of the export.
+
+    Every record carries the company id, so importing the same file twice
+    leaves the same data: companies are upserted by id, their phone
+    numbers and activity links are replaced when they differ. Unchanged
+    companies keep their ``updated_at``, so a repeated import does not
+    show up in incremental exports. Addresses are resolved by text and
+    coordinates, activities by name, once per chunk; missing ones are
+    created, unknown activities become top level ones.
+
+    The import runs in its own process, so caches of a running API do not
+    see it until they expire: companies after ``COMPANY_CACHE_TTL``, the
+    geo engine after ``GEO_ENGINE_REFRESH_INTERVAL``, the taxonomy after
+    ``ACTIVITY_TAXONOMY_CHECK_INTERVAL`` and activity facets after
+    ``ACTIVITY_FACETS_TTL`` seconds.
+    """
+
+    def __init__(self, session: Session, chunk_size: int = IMPORT_CHUNK_SIZE):
+        self.session = session
+        self.chunk_size = chunk_size
+        self.dialect = session.get_bind().dialect.name
+        self._activity_ids: dict[str, int] | None = None
+
+    def run(self, records: Iterable[CompanySchema]) -> ImportReport:
+        report = ImportReport()
+        start = time.perf_counter()
+        for chunk in _chunks(records, self.chunk_size):
+            self.import_chunk(chunk)
+            self.session.commit()
+            report.rows += len(chunk)
+            report.chunks += 1
+            report.seconds = time.perf_counter() - start
+            logger.info(
+                f"Imported {report.rows} companies, "
+                f"{report.rows_per_second:.0f} rows/s"
+            )
+        self.__sync_sequences()
+        report.seconds = time.perf_counter() - start
+        return report
+
+    def import_chunk(self, chunk: list[CompanySchema]) -> None:
+        companies = {company.id: company for company in chunk}
+        address_ids = self.__resolve_addresses(companies.values())
+        activity_ids = self.__resolve_activities(companies.values())
+
+        # Unchanged companies keep their row and ``updated_at``.
+        self.__upsert_companies(
+            [
+                {
+                    "id": company.id,
+                    "name": company.name,
+                    "address_id": address_ids[
+                        (company.address, company.latitude, company.longitude)
+                    ],
+                }
+                for company in companies.values()
+            ]
+        )
+        changed = self.__changed_relations(companies, activity_ids)
+        if not changed:
+            return
+        # Touched like the ORM does for a changed collection, see
+        # ``touch_changed_companies``.
+        self.session.execute(
+            update(Company)
+            .where(Company.id.in_(changed))
+            .values(updated_at=datetime.utcnow())
+        )
+        self.session.execute(
+            delete(PhoneNumber).where(PhoneNumber.company_id.in_(changed))
+        )
+        self.session.execute(
+            delete(company_activities).where(
+                company_activities.c.company_id.in_(changed)
+            )
+        )
+        phone_numbers = [
+            {"number": number, "company_id": pk}
+            for pk in changed
+            for number in companies[pk].phone_numbers
+        ]
+        if phone_numbers:
+            self.session.execute(insert(PhoneNumber), phone_numbers)
+        links = [
+            {"company_id": pk, "activity_id": activity_ids[name]}
+            for pk in changed
+            for name in dict.fromkeys(companies[pk].activities)
+        ]
+        if links:
+            self.session.execute(insert(company_activities), links)
+
+    def __changed_relations(
+        self,
+        companies: dict[int, CompanySchema],
+        activity_ids: dict[str, int],
+    ) -> list[int]:
+        """Ids of companies whose phone numbers or activities differ."""
+        ids = list(companies)
+        phone_numbers = defaultdict(list)
+        result = self.session.execute(
+            select(PhoneNumber.company_id, PhoneNumber.number)
+            .where(PhoneNumber.company_id.in_(ids))
+            .order_by(PhoneNumber.id)
+        )
+        for pk, number in result:
+            phone_numbers[pk].append(number)
+        links = defaultdict(set)
+        result = self.session.execute(
+            select(
+                company_activities.c.company_id,
+                company_activities.c.activity_id,
+            ).where(company_activities.c.company_id.in_(ids))
+        )
+        for pk, activity_id in result:
+            links[pk].add(activity_id)
+        return [
+            pk
+            for pk, company in companies.items()
+            if phone_numbers[pk] != company.phone_numbers
+            or links[pk] != {activity_ids[i] for i in company.activities}
+        ]
+
+    def __resolve_addresses(
+        self, companies: Iterable[CompanySchema]
+    ) -> dict[tuple[str, float, float], int]:
+        """Address ids by text and coordinates.
+
+        Equal texts at different coordinates are different addresses, of
+        identical stored ones the oldest wins.
+        """
+        keys = {
+            (company.address, company.latitude, company.longitude)
+            for company in companies
+        }
+        result = self.session.execute(
+            select(
+                Address.address,
+                Address.latitude,
+                Address.longitude,
+                Address.id,
+            )
+            .where(Address.address.in_({key[0] for key in keys}))
+            .order_by(Address.id.desc())
+        )
+        address_ids = {tuple(row[:3]): row.id for row in result}
+        missing = [
+            {"address": address, "latitude": lat, "longitude": long}
+            for address, lat, long in sorted(keys)
+            if (address, lat, long) not in address_ids
+        ]
+        if missing:
+            result = self.session.execute(
+                insert(Address).returning(
+                    Address.address,
+                    Address.latitude,
+                    Address.longitude,
+                    Address.id,
+                ),
+                missing,
+            )
+            address_ids.update((tuple(row[:3]), row.id) for row in result)
+        return address_ids
+
+    def __resolve_activities(
+        self, companies: Iterable[CompanySchema]
+    ) -> dict[str, int]:
+        if self._activity_ids is None:
+            # Names are not unique, the oldest activity wins.
+            result = self.session.execute(
+                select(Activity.name, Activity.id).order_by(Activity.id.desc())
+            )
+            self._activity_ids = dict(result.all())
+        names = {name for company in companies for name in company.activities}
+        missing = [
+            {"name": name}
+            for name in sorted(names)
+            if name not in self._activity_ids
+        ]
+        if missing:
+            logger.warning(
+                f"Unknown activities created as top level: {missing}"
+            )
+            result = self.session.execute(
+                insert(Activity).returning(Activity.name, Activity.id),
+                missing,
+            )
+            self._activity_ids.update(result.all())
+        return self._activity_ids
+
+    def __upsert_companies(self, rows: list[dict]) -> None:
+        dialect = postgresql if self.dialect == "postgresql" else sqlite
+        stmt = dialect.insert(Company)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Company.id],
+            set_={
+                "name": stmt.excluded.name,
+                "address_id": stmt.excluded.address_id,
+                "updated_at": stmt.excluded.updated_at,
+            },
+            where=or_(
+                Company.name != stmt.excluded.name,
+                Company.address_id != stmt.excluded.address_id,
+            ),
+        )
+        self.session.execute(stmt, rows)
+
+    def __sync_sequences(self) -> None:
+        """Move the id sequence past the imported ids on Postgres."""
+        if self.dialect != "postgresql":
+            return
+        self.session.execute(
+            text(
+                "SELECT setval('companies_id_seq', "
+                "(SELECT coalesce(max(id), 1) FROM companies))"
+            )
+        )
+        self.session.commit()
+
+
+def read_ndjson(path: Path) -> Iterator[CompanySchema]:
+    """Companies from a file written by ``GET /companies/export``."""
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                yield CompanySchema.model_validate_json(line)
+
+
+def read_csv(path: Path) -> Iterator[CompanySchema]:
+    """Companies from a CSV file with a header of the Company fields.
+
+    ``phone_numbers`` and ``activities`` are joined with
+    ``IMPORT_LIST_SEPARATOR``.
+    """
+    with open(path, encoding="utf-8", newline="") as file:
+        for row in csv.DictReader(file):
+            for field in ("phone_numbers", "activities"):
+                value = row[field]
+                row[field] = (
+                    value.split(IMPORT_LIST_SEPARATOR) if value else []
+                )
+            yield CompanySchema.model_validate(row)
+
+
+READERS = {"ndjson": read_ndjson, "csv": read_csv}
+
+
+def _chunks(records: Iterable, size: int) -> Iterator[list]:
+    records = iter(records)
+    while chunk := list(islice(records, size)):
+        yield chunk
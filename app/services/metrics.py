@@ -0,0 +1,310 @@
+import functools
+import inspect
+import math
+import re
+import time
+from collections import Counter as StatementCounter
+from collections import defaultdict
+from collections.abc import Callable
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+
+# SearchService method running in the current task, labels DB metrics.
+current_operation: ContextVar[str] = ContextVar(
+    "current_operation", default="other"
+)
+
+# Placeholder lists of expanded IN clauses, one shape whatever their size.
+PLACEHOLDER_LIST = re.compile(
+    r"\(\s*(?:\?|\$\d+|%\(\w+\)s)(?:\s*,\s*(?:\?|\$\d+|%\(\w+\)s))*\s*\)"
+)
+
+
+class RequestQueries:
+    """SQL statements and timings of one HTTP request."""
+
+    def __init__(self):
+        self.count = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.shapes: StatementCounter[str] = StatementCounter()
+
+    def add(self, statement: str, elapsed: float) -> None:
+        self.count += 1
+        self.db_time += elapsed
+        self.shapes[statement_shape(statement)] += 1
+
+
+current_request_queries: ContextVar[RequestQueries | None] = ContextVar(
+    "current_request_queries", default=None
+)
+
+
+def statement_shape(statement: str) -> str:
+    """Statement with collapsed whitespace and placeholder lists."""
+    return PLACEHOLDER_LIST.sub("(?)", " ".join(statement.split()))
+
+
+class Metric:
+    """Base of metrics rendered in the Prometheus text format."""
+
+    type = "untyped"
+
+    def __init__(self, name: str, description: str, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+
+    def samples(self) -> list[tuple[str, dict, float]]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_render_labels(labels)} {_number(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, description: str, labels=()):
+        super().__init__(name, description, labels)
+        self._values: dict[tuple, float] = defaultdict(float)
+
+    def inc(self, *label_values, amount: float = 1) -> None:
+        self._values[label_values] += amount
+
+    def value(self, *label_values) -> float:
+        return self._values.get(label_values, 0)
+
+    def samples(self) -> list[tuple[str, dict, float]]:
+        return [
+            (self.name, dict(zip(self.labels, key)), value)
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labels=(),
+        buckets=DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._counts: dict[tuple, list[int]] = {}
+        self._sums: dict[tuple, float] = defaultdict(float)
+
+    def observe(self, value: float, *label_values) -> None:
+        counts = self._counts.get(label_values)
+        if counts is None:
+            counts = self._counts[label_values] = [0] * len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        self._sums[label_values] += value
+
+    def count(self, *label_values) -> int:
+        return sum(self._counts.get(label_values, ()))
+
+    def samples(self) -> list[tuple[str, dict, float]]:
+        samples = []
+        for key, counts in sorted(self._counts.items()):
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                samples.append(
+                    (
+                        f"{self.name}_bucket",
+                        {**labels, "le": _number(bound)},
+                        cumulative,
+                    )
+                )
+            samples.append((f"{self.name}_sum", labels, self._sums[key]))
+            samples.append((f"{self.name}_count", labels, cumulative))
+        return samples
+
+
+class Callback(Metric):
+    """Values read when scraped, e.g. pool or cache state.
+
+    ``collect`` returns ``(label_values, value)`` pairs.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        collect: Callable[[], list[tuple[tuple, float]]],
+        labels=(),
+        type: str = "gauge",
+    ):
+        super().__init__(name, description, labels)
+        self.type = type
+        self.collect = collect
+
+    def samples(self) -> list[tuple[str, dict, float]]:
+        return [
+            (self.name, dict(zip(self.labels, key)), value)
+            for key, value in self.collect()
+        ]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(i.render() for i in self._metrics.values()) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_requests = registry.register(
+    Counter(
+        "http_requests_total",
+        "HTTP requests by route and status code.",
+        ("method", "route", "status"),
+    )
+)
+http_request_duration = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "HTTP request latency by route.",
+        ("method", "route"),
+    )
+)
+db_queries = registry.register(
+    Counter(
+        "db_queries_total",
+        "SQL statements by SearchService method.",
+        ("operation",),
+    )
+)
+db_query_duration = registry.register(
+    Histogram(
+        "db_query_duration_seconds",
+        "SQL statement execution time by SearchService method.",
+        ("operation",),
+    )
+)
+db_pool_wait = registry.register(
+    Histogram(
+        "db_pool_wait_seconds",
+        "Time spent waiting for a connection from the pool.",
+    )
+)
+
+
+def db_operation(function):
+    """Label the SQL statements of ``function`` with its name."""
+    name = function.__name__
+    if inspect.isasyncgenfunction(function):
+
+        @functools.wraps(function)
+        async def generator_wrapper(*args, **kwargs):
+            # Labelled around each step only: an abandoned generator is
+            # closed later, maybe in another task and context.
+            generator = function(*args, **kwargs)
+            try:
+                while True:
+                    token = current_operation.set(name)
+                    try:
+                        item = await anext(generator)
+                    except StopAsyncIteration:
+                        return
+                    finally:
+                        current_operation.reset(token)
+                    yield item
+            finally:
+                token = current_operation.set(name)
+                try:
+                    await generator.aclose()
+                finally:
+                    current_operation.reset(token)
+
+        return generator_wrapper
+
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+        token = current_operation.set(name)
+        try:
+            return await function(*args, **kwargs)
+        finally:
+            current_operation.reset(token)
+
+    return wrapper
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, many):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _observe_query(conn, cursor, statement, parameters, context, many):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    operation = current_operation.get()
+    db_queries.inc(operation)
+    db_query_duration.observe(elapsed, operation)
+    if (queries := current_request_queries.get()) is not None:
+        queries.add(statement, elapsed)
+
+
+@event.listens_for(Engine, "handle_error")
+def _drop_query_timer(context) -> None:
+    if context.connection is not None:
+        starts = context.connection.info.get("query_start")
+        if starts:
+            starts.pop()
+
+
+def _render_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    pairs = (f'{key}="{_escape(str(value))}"' for key, value in labels.items())
+    return "{" + ",".join(pairs) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
@@ -0,0 +1,45 @@
+from sqlalchemy import (
+    Select,
+    column,
+    func,
+    literal,
+    literal_column,
+    or_,
+    select,
+    table,
+)
+
+from app.models.company import Company
+
+# Shadow FTS5 table of company names, created by a migration on SQLite.
+companies_fts = table("companies_fts", column("rowid"), column("name"))
+
+# The FTS5 trigram tokenizer can only match queries of 3+ characters.
+TRIGRAM_MIN_LENGTH = 3
+
+
+def ranked_company_ids(dialect: str, name: str) -> Select:
+    """Ids of companies whose name matches ``name`` with their relevance.
+
+    Higher ``rank`` is better. Postgres uses ``pg_trgm`` similarity backed
+    by a GIN index, SQLite uses the FTS5 trigram table and BM25.
+    """
+    if dialect == "postgresql":
+        return select(
+            Company.id.label("id"),
+            func.similarity(Company.name, name).label("rank"),
+        ).where(
+            or_(
+                Company.name.op("%")(name),
+                Company.name.icontains(name, autoescape=True),
+            )
+        )
+    if len(name) >= TRIGRAM_MIN_LENGTH:
+        phrase = '"{}"'.format(name.replace('"', '""'))
+        return select(
+            companies_fts.c.rowid.label("id"),
+            (-func.bm25(literal_column(companies_fts.name))).label("rank"),
+        ).where(companies_fts.c.name.match(phrase))
+    return select(Company.id.label("id"), literal(0.0).label("rank")).where(
+        Company.name.icontains(name, autoescape=True)
+    )
@@ -0,0 +1,55 @@
+import base64
+import json
+from typing import Any, Callable, Sequence, TypeVar
+
+from sqlalchemy import ColumnElement, tuple_
+
+from app.services.errors import InvalidCursorError
+
+T = TypeVar("T")
+
+
+def encode_cursor(*values: Any) -> str:
+    """Opaque cursor from the sort key of the last item of a page."""
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(
+    cursor: str,
+    size: int,
+    types: Sequence[tuple[type, ...]] | None = None,
+) -> list:
+    """Sort key values of a cursor, numbers unless ``types`` are given."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursorError
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursorError
+    types = types or [(int, float)] * size
+    if not all(isinstance(i, t) for i, t in zip(values, types)):
+        raise InvalidCursorError
+    return values
+
+
+def after_cursor(
+    keys: Sequence[ColumnElement],
+    cursor: str,
+) -> ColumnElement[bool]:
+    """Rows strictly after the cursor for an ascending sort by ``keys``."""
+    values = decode_cursor(cursor, len(keys))
+    return tuple_(*keys) > tuple_(*values)
+
+
+def paginate(
+    items: Sequence[T],
+    limit: int,
+    key: Callable[[T], tuple],
+) -> tuple[list[T], str | None]:
+    """Cut a page from ``limit + 1`` fetched items and build next cursor."""
+    if len(items) <= limit:
+        return list(items), None
+    page = list(items[:limit])
+    return page, encode_cursor(*key(page[-1]))
@@ -0,0 +1,101 @@
+from sqlalchemy import Select, select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import GenericFunction
+from sqlalchemy.types import JSON
+
+from app.models import (
+    Activity,
+    Address,
+    Company,
+    PhoneNumber,
+    company_activities,
+)
+
+# SQLite accepts ORDER BY in aggregate function arguments since 3.44.
+SQLITE_AGGREGATE_ORDER_BY = (3, 44)
+
+
+class json_array_agg(GenericFunction):
+    """JSON array of the first argument ordered by the second one.
+
+    Renders ``json_agg`` on Postgres and ``json_group_array`` on SQLite,
+    an empty group gives ``[]`` on both. SQLite before 3.44 ignores the
+    order, there the rows have to come from an ordered subquery, see
+    ``ordered_array``.
+    """
+
+    type = JSON()
+    inherit_cache = True
+
+
+@compiles(json_array_agg, "postgresql")
+def _compile_json_array_agg_postgresql(element, compiler, **kw):
+    value, order_by = element.clauses
+    return "coalesce(json_agg({} ORDER BY {}), '[]'::json)".format(
+        compiler.process(value, **kw), compiler.process(order_by, **kw)
+    )
+
+
+@compiles(json_array_agg, "sqlite")
+def _compile_json_array_agg_sqlite(element, compiler, **kw):
+    value, order_by = element.clauses
+    version = compiler.dialect.server_version_info or ()
+    if version < SQLITE_AGGREGATE_ORDER_BY:
+        return "json_group_array({})".format(compiler.process(value, **kw))
+    return "json_group_array({} ORDER BY {})".format(
+        compiler.process(value, **kw), compiler.process(order_by, **kw)
+    )
+
+
+def ordered_array(name: str, value, order_by, query: Select):
+    """Scalar subquery of ``value`` rows of ``query`` as a JSON array.
+
+    The rows are aggregated from a subquery ordered by ``order_by``, so
+    the array keeps the order on every SQLite version. An aggregate outer
+    query keeps SQLite from flattening the subquery and its ORDER BY.
+    """
+    rows = (
+        query.add_columns(value.label("value"), order_by.label("position"))
+        .order_by(order_by)
+        .correlate(Company)
+        .subquery(name)
+    )
+    return select(
+        json_array_agg(rows.c.value, rows.c.position)
+    ).scalar_subquery()
+
+
+def company_projection(*columns) -> Select:
+    """One row per company with every field of the Company schema.
+
+    Phone numbers and activity names are aggregated by correlated
+    subqueries, so no ORM objects and no extra queries are needed.
+    """
+    phone_numbers = ordered_array(
+        "phone_number_rows",
+        PhoneNumber.number,
+        PhoneNumber.id,
+        select().where(PhoneNumber.company_id == Company.id),
+    )
+    activities = ordered_array(
+        "activity_rows",
+        Activity.name,
+        Activity.id,
+        select()
+        .join_from(
+            Activity,
+            company_activities,
+            company_activities.c.activity_id == Activity.id,
+        )
+        .where(company_activities.c.company_id == Company.id),
+    )
+    return select(
+        Company.id,
+        Company.name,
+        Address.address,
+        Address.latitude,
+        Address.longitude,
+        phone_numbers.label("phone_numbers"),
+        activities.label("activities"),
+        *columns,
+    ).join_from(Company, Address)
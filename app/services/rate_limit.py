@@ -0,0 +1,53 @@
+import math
+import time
+
+from app.settings import get_current_config
+
+
+class RateLimiter:
+    """In-process token bucket per key.
+
+    Every key gets ``burst`` tokens, refilled at ``rate`` tokens per
+    second, and each request takes one.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: dict[str, tuple[float, float]] = {}
+
+    def allow(self, key: str) -> bool:
+        now = time.monotonic()
+        tokens = self.__tokens(key, now)
+        if tokens < 1:
+            self._buckets[key] = (tokens, now)
+            return False
+        self._buckets[key] = (tokens - 1, now)
+        return True
+
+    def retry_after(self, key: str) -> int:
+        """Whole seconds until ``key`` gets a token again."""
+        tokens = self.__tokens(key, time.monotonic())
+        if tokens >= 1:
+            return 0
+        return math.ceil((1 - tokens) / self.rate)
+
+    def __tokens(self, key: str, now: float) -> float:
+        tokens, updated_at = self._buckets.get(key, (self.burst, now))
+        return min(self.burst, tokens + (now - updated_at) * self.rate)
+
+
+_rate_limiter: RateLimiter | None = None
+
+
+def get_rate_limiter() -> RateLimiter | None:
+    """Shared limiter or None if ``RATE_LIMIT_PER_SECOND`` is not set."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        config = get_current_config()
+        if not config.RATE_LIMIT_PER_SECOND:
+            return None
+        _rate_limiter = RateLimiter(
+            config.RATE_LIMIT_PER_SECOND, config.RATE_LIMIT_BURST
+        )
+    return _rate_limiter
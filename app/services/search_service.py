@@ -1,230 +1,573 @@
+from collections.abc import AsyncIterator, Callable
+from datetime import datetime
 from logging import getLogger
 
-from sqlalchemy import ScalarResult, Select, func, or_, select
+from sqlalchemy import Result, Select, func, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
-from app.constants import EARTH_RADIUS
+from app.connectors.sql import get_async_read_session_factory
+from app.constants import (
+    ACTIVITY_TREE_DEPTH,
+    DEFAULT_PAGE_SIZE,
+    EXPORT_CHUNK_SIZE,
+    NEAREST_FIRST_RADIUS,
+    NEAREST_MAX_RADIUS,
+    NEAREST_RADIUS_GROWTH,
+    VIEWPORT_COMPANIES_ZOOM,
+    VIEWPORT_GRID_CELLS,
+    VIEWPORT_MAX_COMPANIES,
+)
 from app.models import Activity, company_activities
 from app.models.address import Address
 from app.models.company import Company
+from app.schemas.activities import ActivityFacets as ActivityFacetsSchema
 from app.schemas.companies import Companies as CompaniesSchema
+from app.schemas.companies import CompaniesBatch as CompaniesBatchSchema
+from app.schemas.companies import (
+    CompaniesInViewport as CompaniesInViewportSchema,
+)
+from app.schemas.companies import CompaniesSearch as CompaniesSearchSchema
+from app.schemas.companies import (
+    CompaniesWithDistance as CompaniesWithDistanceSchema,
+)
 from app.schemas.companies import Company as CompanySchema
+from app.schemas.companies import CompanyBatchItem as CompanyBatchItemSchema
+from app.schemas.companies import CompanyCluster as CompanyClusterSchema
+from app.schemas.companies import CompanySearchItem as CompanySearchItemSchema
+from app.schemas.companies import (
+    CompanyWithDistance as CompanyWithDistanceSchema,
+)
+from app.schemas.companies import GeoCircle
+from app.schemas.companies import SearchCompanies as SearchCompaniesSchema
+from app.services.cache import LRUCache
+from app.services.company_search import (
+    activity_subtree,
+    search_parameters,
+    search_statement,
+)
 from app.services.errors import CompanyNotFoundError, UnexpectedError
+from app.services.facets import ActivityFacets, activity_counts, facet_tree
+from app.services.geo import (
+    distance_km,
+    viewport_cell_size,
+    within_bounding_box,
+    within_ranges,
+)
+from app.services.geo_engine import GeoEngine
+from app.services.metrics import db_operation
+from app.services.name_search import ranked_company_ids
+from app.services.pagination import after_cursor, decode_cursor, paginate
+from app.services.projection import company_projection
+from app.services.single_flight import SingleFlight, coalesced
+from app.services.taxonomy import ActivityTaxonomy
 
 logger = getLogger("build-system")
 
 
 class SearchService:
+    """Read only queries of companies.
 
-    def __init__(self, session_factory: AsyncSession):
+    Every query runs in ``session`` and nothing is committed, the owner of
+    the session closes it, e.g. ``get_find_service`` once per request. The
+    export outlives the request and reads from a session of its own made
+    by ``session_factory``.
+    """
+
+    def __init__(
+        self,
+        session: AsyncSession,
+        geo_engine: GeoEngine | None = None,
+        taxonomy: ActivityTaxonomy | None = None,
+        company_cache: LRUCache[CompanySchema] | None = None,
+        single_flight: SingleFlight | None = None,
+        facets: ActivityFacets | None = None,
+        session_factory: Callable[
+            [], AsyncSession
+        ] = get_async_read_session_factory,
+    ):
+        self.session = session
+        self.geo_engine = geo_engine
+        self.taxonomy = taxonomy
+        self.company_cache = company_cache
+        self.single_flight = single_flight
+        self.facets = facets
         self.session_factory = session_factory
 
-    async def __execute(self, stmt: Select) -> ScalarResult:
-        async with self.session_factory as session:
-            try:
-                result = await session.execute(stmt)
-            except Exception as e:
-                logger.exception(e)
-                await session.rollback()
-                raise UnexpectedError
-            else:
-                await session.commit()
-                return result.scalars()
+    async def __execute(
+        self, stmt: Select, parameters: dict | None = None
+    ) -> Result:
+        try:
+            return await self.session.execute(stmt, parameters)
+        except Exception as e:
+            logger.exception(e)
+            await self.session.rollback()
+            raise UnexpectedError
 
+    @db_operation
     async def find_company_by_id(self, pk: int) -> CompanySchema:
         logger.info(f"Attempt find company by id: {pk}")
-        stmt = (
-            select(Company)
-            .filter_by(id=pk)
-            .options(
-                selectinload(Company.address),
-                selectinload(Company.phone_numbers),
-                selectinload(Company.activities),
-            )
-        )
-        scalar_result = await self.__execute(stmt)
-        company = scalar_result.first()
+        if self.company_cache is not None:
+            cached = self.company_cache.get(pk)
+            if cached is not None:
+                logger.info(f"Cached result: {cached.name}, id: {pk}")
+                return cached
+        stmt = company_projection().where(Company.id == pk)
+        result = await self.__execute(stmt)
+        company = result.first()
         if not company:
             raise CompanyNotFoundError
         logger.info(f"Search result: {company}")
-        return CompanySchema(
-            id=company.id,
-            name=company.name,
-            address=company.address.address,
-            phone_numbers=[i.number for i in company.phone_numbers],
-            latitude=company.address.latitude,
-            longitude=company.address.longitude,
-            activities=[i.name for i in company.activities],
+        schema = CompanySchema(**company._mapping)
+        if self.company_cache is not None:
+            self.company_cache.set(pk, schema)
+        return schema
+
+    @db_operation
+    async def find_companies_by_ids(
+        self, ids: list[int]
+    ) -> CompaniesBatchSchema:
+        """Companies in the order of ``ids``, missing ones are marked.
+
+        Cached companies are taken from the cache, the rest are loaded with
+        one statement whatever the size of the batch.
+        """
+        logger.info(f"Attempt find companies by ids: {ids}")
+        companies: dict[int, CompanySchema] = {}
+        if self.company_cache is not None:
+            for pk in ids:
+                cached = self.company_cache.get(pk)
+                if cached is not None:
+                    companies[pk] = cached
+        missing = set(ids) - companies.keys()
+        if missing:
+            stmt = company_projection().where(Company.id.in_(sorted(missing)))
+            result = await self.__execute(stmt)
+            for row in result:
+                schema = CompanySchema(**row._mapping)
+                companies[schema.id] = schema
+                if self.company_cache is not None:
+                    self.company_cache.set(schema.id, schema)
+        logger.info(f"Search result: {len(companies)} of {len(set(ids))}")
+        return CompaniesBatchSchema(
+            companies=[
+                CompanyBatchItemSchema(
+                    id=pk, found=pk in companies, company=companies.get(pk)
+                )
+                for pk in ids
+            ],
         )
 
+    @db_operation
     async def find_company_by_name(self, name: str) -> CompanySchema:
         logger.info(f"Attempt find company by name: {name}")
-        stmt = (
-            select(Company)
-            .where(
-                or_(
-                    Company.name == name,
-                    Company.name.ilike(f"%{name}%"),
-                )
-            )
-            .options(
-                selectinload(Company.address),
-                selectinload(Company.phone_numbers),
-                selectinload(Company.activities),
+        stmt = company_projection().where(
+            or_(
+                Company.name == name,
+                Company.name.ilike(f"%{name}%"),
             )
         )
-        scalar_result = await self.__execute(stmt)
-        company = scalar_result.first()
+        result = await self.__execute(stmt)
+        company = result.first()
         logger.info(f"Search result: {company}")
         if not company:
             raise CompanyNotFoundError
-        return CompanySchema(
-            id=company.id,
-            name=company.name,
-            address=company.address.address,
-            phone_numbers=[i.number for i in company.phone_numbers],
-            latitude=company.address.latitude,
-            longitude=company.address.longitude,
-            activities=[i.name for i in company.activities],
-        )
+        return CompanySchema(**company._mapping)
 
-    async def find_company_by_activity(self, activity: str) -> CompaniesSchema:
-        logger.info(f"Attempt find company by activity: {activity}")
-        first_stmt = select(Activity).where(Activity.name == activity)
-        scalar_first_result = await self.__execute(first_stmt)
-        root_activity = scalar_first_result.first()
-        if not root_activity:
+    @db_operation
+    async def search_companies_by_name(
+        self,
+        name: str,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: str | None = None,
+    ) -> CompaniesSchema:
+        logger.info(f"Attempt search companies by name: {name}")
+        dialect = self.session.bind.dialect.name
+        ranked = ranked_company_ids(dialect, name).subquery()
+        sort_keys = (-ranked.c.rank, Company.id)
+        stmt = (
+            company_projection(ranked.c.rank)
+            .join(ranked, ranked.c.id == Company.id)
+            .order_by(*sort_keys)
+            .limit(limit + 1)
+        )
+        if cursor is not None:
+            stmt = stmt.where(after_cursor(sort_keys, cursor))
+        result = await self.__execute(stmt)
+        companies, next_cursor = paginate(
+            result.all(), limit, key=lambda row: (-row.rank, row.id)
+        )
+        logger.info(f"Search result: {companies}")
+        if not companies and cursor is None:
             raise CompanyNotFoundError
+        return CompaniesSchema(
+            next_cursor=next_cursor,
+            companies=[CompanySchema(**i._mapping) for i in companies],
+        )
 
-        all_ids = await self.__collect_activity_ids(root_activity.id, level=3)
-        second_stmt = (
-            select(Company)
-            .join(company_activities)
-            .where(company_activities.c.activity_id.in_(all_ids))
-            .options(
-                selectinload(Company.address),
-                selectinload(Company.phone_numbers),
-                selectinload(Company.activities),
+    @db_operation
+    @coalesced
+    async def find_company_by_activity(
+        self,
+        activity: str,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: str | None = None,
+    ) -> CompaniesSchema:
+        logger.info(f"Attempt find company by activity: {activity}")
+        if self.taxonomy is not None:
+            activity_ids = await self.__taxonomy_subtree(activity)
+        else:
+            activity_ids = activity_subtree(activity, ACTIVITY_TREE_DEPTH)
+        stmt = (
+            company_projection()
+            .where(
+                Company.id.in_(
+                    select(company_activities.c.company_id).where(
+                        company_activities.c.activity_id.in_(activity_ids)
+                    )
+                )
             )
+            .order_by(Company.id)
+            .limit(limit + 1)
         )
-        scalar_second_result = await self.__execute(second_stmt)
-        companies = scalar_second_result.unique().all()
+        if cursor is not None:
+            stmt = stmt.where(after_cursor((Company.id,), cursor))
+        result = await self.__execute(stmt)
+        companies, next_cursor = paginate(
+            result.all(), limit, key=lambda row: (row.id,)
+        )
+        if not companies and cursor is None and self.taxonomy is None:
+            exists_stmt = select(Activity.id).where(Activity.name == activity)
+            exists_result = await self.__execute(exists_stmt)
+            if exists_result.first() is None:
+                raise CompanyNotFoundError
         return CompaniesSchema(
-            companies=[
-                CompanySchema(
-                    id=i.id,
-                    name=i.name,
-                    address=i.address.address,
-                    phone_numbers=[i.number for i in i.phone_numbers],
-                    latitude=i.address.latitude,
-                    longitude=i.address.longitude,
-                    activities=[i.name for i in i.activities],
-                )
-                for i in companies
-            ],
+            next_cursor=next_cursor,
+            companies=[CompanySchema(**i._mapping) for i in companies],
         )
 
-    async def __collect_activity_ids(
-        self,
-        root_id: int,
-        level: int = 3,
-    ) -> set[int]:
-        to_check = [root_id]
-        all_ids = set(to_check)
-        current_level = 0
-
-        while to_check and current_level < level:
-            stmt = select(Activity.id).where(Activity.parent_id.in_(to_check))
-            result = await self.__execute(stmt)
-            children = result.all()
-            to_check = children
-            all_ids.update(children)
-            current_level += 1
-        return all_ids
+    async def __taxonomy_subtree(self, activity: str) -> list[int]:
+        if self.taxonomy.is_stale:
+            await self.taxonomy.refresh(self.session)
+        subtree = self.taxonomy.subtree_by_name(activity)
+        if subtree is None:
+            raise CompanyNotFoundError
+        return sorted(subtree)
 
-    async def find_companies_by_address(self, address: str) -> CompaniesSchema:
+    @db_operation
+    @coalesced
+    async def find_companies_by_address(
+        self,
+        address: str,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: str | None = None,
+    ) -> CompaniesSchema:
         logger.info(f"Attempt find companies by address: {address}")
         stmt = (
-            select(Company)
-            .join(Address)
+            company_projection()
             .where(
                 or_(
                     Address.address == address,
                     Address.address.ilike(f"%{address}%"),
                 )
             )
-            .options(
-                selectinload(Company.address),
-                selectinload(Company.phone_numbers),
-                selectinload(Company.activities),
-            )
+            .order_by(Company.id)
+            .limit(limit + 1)
+        )
+        if cursor is not None:
+            stmt = stmt.where(after_cursor((Company.id,), cursor))
+        result = await self.__execute(stmt)
+        companies, next_cursor = paginate(
+            result.all(), limit, key=lambda row: (row.id,)
         )
-        scalar_result = await self.__execute(stmt)
-        companies = scalar_result.all()
         logger.info(f"Search result: {companies}")
-        if not companies:
+        if not companies and cursor is None:
             raise CompanyNotFoundError
         return CompaniesSchema(
+            next_cursor=next_cursor,
+            companies=[CompanySchema(**i._mapping) for i in companies],
+        )
+
+    @db_operation
+    async def search_companies(
+        self, filters: SearchCompaniesSchema
+    ) -> CompaniesSearchSchema:
+        """Companies matching every given filter, with one statement.
+
+        The statement is built once per set of filters, see
+        ``search_statement``.
+        """
+        logger.info(f"Attempt search companies: {filters}")
+        activity_ids = None
+        if filters.activity is not None and self.taxonomy is not None:
+            activity_ids = await self.__taxonomy_subtree(filters.activity)
+        shape, parameters = search_parameters(filters, activity_ids)
+        result = await self.__execute(search_statement(shape), parameters)
+        # Sort values are named as the columns, "name" or "distance".
+        companies, next_cursor = paginate(
+            result.all(),
+            filters.limit,
+            key=lambda row: (getattr(row, filters.sort_by), row.id),
+        )
+        logger.info(f"Search result: {companies}")
+        if not companies and filters.cursor is None:
+            raise CompanyNotFoundError
+        return CompaniesSearchSchema(
+            next_cursor=next_cursor,
             companies=[
-                CompanySchema(
-                    id=i.id,
-                    name=i.name,
-                    address=i.address.address,
-                    phone_numbers=[i.number for i in i.phone_numbers],
-                    latitude=i.address.latitude,
-                    longitude=i.address.longitude,
-                    activities=[i.name for i in i.activities],
-                )
-                for i in companies
+                CompanySearchItemSchema(**i._mapping) for i in companies
             ],
         )
 
+    @db_operation
     async def find_companies_by_geo(
         self,
         lat: float,
         long: float,
         radius_km: int,
-    ) -> CompaniesSchema:
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: str | None = None,
+    ) -> CompaniesWithDistanceSchema:
+        logger.info(
+            f"Attempt find companies by geo: {lat}, {long}, {radius_km} km"
+        )
+        if self.geo_engine is not None:
+            await self.__refresh_geo_engine()
+            pairs = self.geo_engine.within_radius(lat, long, radius_km)
+            if cursor is not None:
+                last = tuple(decode_cursor(cursor, 2))
+                pairs = [i for i in pairs if (i[1], i[0]) > last]
+            pairs, next_cursor = paginate(
+                pairs[: limit + 1], limit, key=lambda i: (i[1], i[0])
+            )
+            if not pairs and cursor is None:
+                raise CompanyNotFoundError
+            return await self.__companies_with_distance(pairs, next_cursor)
 
+        distance = distance_km(lat, long)
+        sort_keys = (distance, Company.id)
         stmt = (
-            select(Company)
-            .join(Address)
+            company_projection(distance.label("distance"))
             .where(
-                EARTH_RADIUS
-                * func.acos(
-                    func.cos(func.radians(lat))
-                    * func.cos(func.radians(Address.latitude))
-                    * func.cos(
-                        func.radians(Address.longitude) - func.radians(long)
-                    )
-                    + func.sin(func.radians(lat))
-                    * func.sin(func.radians(Address.latitude))
-                )
-                <= radius_km
-            )
-            .options(
-                selectinload(Company.address),
-                selectinload(Company.phone_numbers),
-                selectinload(Company.activities),
+                within_bounding_box(lat, long, radius_km),
+                distance <= radius_km,
             )
+            .order_by(*sort_keys)
+            .limit(limit + 1)
+        )
+        if cursor is not None:
+            stmt = stmt.where(after_cursor(sort_keys, cursor))
+        result = await self.__execute(stmt)
+        companies, next_cursor = paginate(
+            result.all(), limit, key=lambda row: (row.distance, row.id)
         )
-        scalar_result = await self.__execute(stmt)
-        companies = scalar_result.all()
         logger.info(f"Search result: {companies}")
+        if not companies and cursor is None:
+            raise CompanyNotFoundError
+        return CompaniesWithDistanceSchema(
+            next_cursor=next_cursor,
+            companies=[
+                CompanyWithDistanceSchema(**i._mapping) for i in companies
+            ],
+        )
+
+    @db_operation
+    async def find_nearest_companies(
+        self,
+        lat: float,
+        long: float,
+        limit: int,
+    ) -> CompaniesWithDistanceSchema:
+        logger.info(f"Attempt find {limit} nearest companies: {lat}, {long}")
+        if self.geo_engine is not None:
+            await self.__refresh_geo_engine()
+            pairs = [
+                (pk, distance)
+                for pk, distance in self.geo_engine.nearest(lat, long, limit)
+                if distance <= NEAREST_MAX_RADIUS
+            ]
+            if not pairs:
+                raise CompanyNotFoundError
+            return await self.__companies_with_distance(pairs)
+
+        # A circle with ``limit`` companies holds the nearest ones, each
+        # try is an index range scan of its bounding box. Growth stops at
+        # NEAREST_MAX_RADIUS, so sparse areas cost a few scans and never
+        # the whole table.
+        distance = distance_km(lat, long)
+        stmt = (
+            company_projection(distance.label("distance"))
+            .order_by(distance, Company.id)
+            .limit(limit)
+        )
+        radius = NEAREST_FIRST_RADIUS
+        while True:
+            result = await self.__execute(
+                stmt.where(
+                    within_bounding_box(lat, long, radius),
+                    distance <= radius,
+                )
+            )
+            companies = result.all()
+            if len(companies) == limit or radius >= NEAREST_MAX_RADIUS:
+                break
+            radius = min(radius * NEAREST_RADIUS_GROWTH, NEAREST_MAX_RADIUS)
+        logger.info(f"Search result within {radius:.0f} km: {companies}")
         if not companies:
             raise CompanyNotFoundError
-        return CompaniesSchema(
+        return CompaniesWithDistanceSchema(
+            companies=[
+                CompanyWithDistanceSchema(**i._mapping) for i in companies
+            ],
+        )
+
+    @db_operation
+    async def find_companies_in_viewport(
+        self,
+        min_lat: float,
+        min_long: float,
+        max_lat: float,
+        max_long: float,
+        zoom: int,
+    ) -> CompaniesInViewportSchema:
+        """Companies of a map viewport, or their clusters at low zoom.
+
+        From ``VIEWPORT_COMPANIES_ZOOM`` up to ``VIEWPORT_MAX_COMPANIES``
+        companies are returned. Otherwise they are grouped in SQL into
+        cells of ``viewport_cell_size``, at most ``VIEWPORT_GRID_CELLS``
+        across the viewport, so the response stays small at every zoom.
+        """
+        logger.info(
+            f"Attempt find companies in viewport: {min_lat}, {min_long}, "
+            f"{max_lat}, {max_long}, zoom {zoom}"
+        )
+        span_long = max_long - min_long
+        longitude_ranges = [(min_long, max_long)]
+        if min_long > max_long:
+            span_long += 360
+            longitude_ranges = [(min_long, 180), (-180, max_long)]
+        in_viewport = within_ranges(min_lat, max_lat, longitude_ranges)
+
+        if zoom >= VIEWPORT_COMPANIES_ZOOM:
+            # Ids first, a crowded viewport must not aggregate the phones
+            # and activities of companies that end up clustered.
+            stmt = (
+                select(Company.id)
+                .join(Address)
+                .where(in_viewport)
+                .limit(VIEWPORT_MAX_COMPANIES + 1)
+            )
+            result = await self.__execute(stmt)
+            ids = result.scalars().all()
+            if len(ids) <= VIEWPORT_MAX_COMPANIES:
+                stmt = (
+                    company_projection()
+                    .where(Company.id.in_(ids))
+                    .order_by(Company.id)
+                )
+                result = await self.__execute(stmt)
+                companies = result.all()
+                logger.info(f"Search result: {companies}")
+                return CompaniesInViewportSchema(
+                    companies=[CompanySchema(**i._mapping) for i in companies]
+                )
+
+        cell = viewport_cell_size(
+            zoom, max(max_lat - min_lat, span_long), VIEWPORT_GRID_CELLS
+        )
+        cell_x = func.floor(Address.longitude / cell)
+        cell_y = func.floor(Address.latitude / cell)
+        stmt = (
+            select(
+                func.avg(Address.latitude).label("latitude"),
+                func.avg(Address.longitude).label("longitude"),
+                func.count(Company.id).label("count"),
+            )
+            .join_from(Company, Address)
+            .where(in_viewport)
+            .group_by(cell_y, cell_x)
+            .order_by(cell_y, cell_x)
+        )
+        result = await self.__execute(stmt)
+        clusters = result.all()
+        logger.info(f"Search result: {len(clusters)} clusters of {cell}")
+        return CompaniesInViewportSchema(
+            cell_size=cell,
+            clusters=[CompanyClusterSchema(**i._mapping) for i in clusters],
+        )
+
+    @db_operation
+    async def count_companies_by_activity(
+        self, geo: GeoCircle | None = None
+    ) -> ActivityFacetsSchema:
+        """Activity tree with company counts, descendants included.
+
+        Without ``geo`` the shared rollup is returned, it is rebuilt only
+        when stale. Counts within a radius are made by one statement.
+        """
+        logger.info(f"Attempt count companies by activity: {geo}")
+        if geo is None and self.facets is not None:
+            tree = await self.facets.tree(self.session)
+        else:
+            result = await self.__execute(activity_counts(geo))
+            tree = facet_tree(result.all())
+        return ActivityFacetsSchema(activities=tree)
+
+    @db_operation
+    async def export_companies(
+        self,
+        updated_since: datetime | None = None,
+        after_id: int | None = None,
+        chunk_size: int = EXPORT_CHUNK_SIZE,
+    ) -> AsyncIterator[list[CompanySchema]]:
+        """Every company ordered by id, in chunks of ``chunk_size``.
+
+        Rows are streamed from a server-side cursor, so only one chunk is
+        held in memory. ``after_id`` resumes an interrupted export.
+
+        A streaming response is sent after the request dependencies have
+        exited, so the export opens and closes a session of its own.
+        """
+        logger.info(
+            f"Attempt export companies updated since {updated_since}, "
+            f"after id {after_id}"
+        )
+        stmt = company_projection().order_by(Company.id)
+        if updated_since is not None:
+            stmt = stmt.where(Company.updated_at >= updated_since)
+        if after_id is not None:
+            stmt = stmt.where(Company.id > after_id)
+        stmt = stmt.execution_options(yield_per=chunk_size)
+        async with self.session_factory() as session:
+            try:
+                result = await session.stream(stmt)
+                async for rows in result.partitions():
+                    yield [CompanySchema(**i._mapping) for i in rows]
+            except Exception as e:
+                logger.exception(e)
+                raise UnexpectedError
+
+    async def __refresh_geo_engine(self) -> None:
+        await self.geo_engine.ready(self.session)
+
+    async def __companies_with_distance(
+        self,
+        pairs: list[tuple[int, float]],
+        next_cursor: str | None = None,
+    ) -> CompaniesWithDistanceSchema:
+        """Load companies found by the geo engine, keeping its order."""
+        stmt = company_projection().where(
+            Company.id.in_([pk for pk, _ in pairs])
+        )
+        result = await self.__execute(stmt)
+        companies = {row.id: row for row in result}
+        logger.info(f"Search result: {list(companies.values())}")
+        return CompaniesWithDistanceSchema(
+            next_cursor=next_cursor,
             companies=[
-                CompanySchema(
-                    id=i.id,
-                    name=i.name,
-                    address=i.address.address,
-                    phone_numbers=[i.number for i in i.phone_numbers],
-                    latitude=i.address.latitude,
-                    longitude=i.address.longitude,
-                    activities=[i.name for i in i.activities],
+                CompanyWithDistanceSchema(
+                    **companies[pk]._mapping, distance=distance
                 )
-                for i in companies
+                for pk, distance in pairs
+                if pk in companies
             ],
         )
@@ -0,0 +1,127 @@
+import asyncio
+import copy
+import functools
+import inspect
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from logging import getLogger
+from typing import Hashable, TypeVar
+
+from app.services.metrics import Callback, registry
+from app.settings import get_current_config
+
+logger = getLogger("build-system")
+
+V = TypeVar("V")
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one in-flight task.
+
+    The first call runs the function, calls with its key made before it
+    finishes wait for the same result or exception. If the first call is
+    cancelled, the waiting ones run the function themselves.
+    """
+
+    def __init__(self):
+        self.coalesced: Counter[str] = Counter()
+        self._tasks: dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    async def run(
+        self,
+        key: tuple[str, ...],
+        function: Callable[[], Awaitable[V]],
+    ) -> V:
+        """Result of ``function``, ``key[0]`` labels the coalesced calls."""
+        task = self._tasks.get(key)
+        if task is None or task.done():
+            task = asyncio.ensure_future(function())
+            self._tasks[key] = task
+            task.add_done_callback(functools.partial(self._forget, key))
+            return await task
+
+        self.coalesced[key[0]] += 1
+        logger.info(f"Coalesced with the call in flight: {key}")
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.cancelled():
+                raise
+        return await self.run(key, function)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+
+
+def coalesced(method):
+    """Share one call of a ``SearchService`` method between identical ones.
+
+    Calls are identical if their arguments bound to the signature, with
+    defaults applied, are equal. Without ``self.single_flight`` every call
+    runs on its own.
+
+    The shared call runs on a session of its own from
+    ``self.session_factory``, so no request depends on the session or the
+    pool connection of another one. Its statements are accounted to the
+    request that started it, Server-Timing and the query budget of the
+    coalesced requests do not include them.
+    """
+    signature = inspect.signature(method)
+
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        if self.single_flight is None:
+            return await method(self, *args, **kwargs)
+        arguments = signature.bind(self, *args, **kwargs)
+        arguments.apply_defaults()
+        key = (method.__name__, *list(arguments.arguments.items())[1:])
+
+        async def shared():
+            async with self.session_factory() as session:
+                service = copy.copy(self)
+                service.session = session
+                return await method(service, *args, **kwargs)
+
+        return await self.single_flight.run(key, shared)
+
+    return wrapper
+
+
+_single_flight: SingleFlight | None = None
+
+
+def get_single_flight() -> SingleFlight | None:
+    """Shared single flight or None if ``SEARCH_COALESCING`` is off."""
+    global _single_flight
+    if _single_flight is None:
+        if not get_current_config().SEARCH_COALESCING:
+            return None
+        _single_flight = SingleFlight()
+    return _single_flight
+
+
+def _coalesced_stats() -> list[tuple[tuple, float]]:
+    if _single_flight is None:
+        return []
+    return [
+        ((operation,), count)
+        for operation, count in sorted(_single_flight.coalesced.items())
+    ]
+
+
+registry.register(
+    Callback(
+        "search_coalesced_requests_total",
+        (
+            "SearchService calls served by an identical call in flight, "
+            "their statements are counted for the first call only."
+        ),
+        _coalesced_stats,
+        ("operation",),
+        type="counter",
+    )
+)
@@ -0,0 +1,136 @@
+import asyncio
+import time
+from collections import defaultdict
+from logging import getLogger
+
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from app.constants import ACTIVITY_TREE_DEPTH
+from app.models.activity import Activity
+from app.settings import get_current_config
+
+logger = getLogger("build-system")
+
+
+class ActivityTaxonomy:
+    """In-memory copy of the activity tree with precomputed descendants.
+
+    Local changes invalidate the cache through mapper events. Changes
+    made by other workers are noticed by a check every ``check_interval``
+    seconds: ``version`` is the count and the latest ``updated_at`` of the
+    activities, one cheap query, and the tree is reloaded only when it
+    differs.
+    """
+
+    def __init__(
+        self,
+        check_interval: float | None = None,
+        depth: int = ACTIVITY_TREE_DEPTH,
+    ):
+        self.check_interval = check_interval
+        self.depth = depth
+        self.version: str | None = None
+        self.checked_at: float | None = None
+        self._stale = True
+        self._lock = asyncio.Lock()
+        self._ids_by_name: dict[str, frozenset[int]] = {}
+        self._descendants: dict[int, frozenset[int]] = {}
+
+    @property
+    def is_stale(self) -> bool:
+        if self._stale:
+            return True
+        return (
+            self.check_interval is not None
+            and time.monotonic() - self.checked_at > self.check_interval
+        )
+
+    def invalidate(self) -> None:
+        self._stale = True
+
+    def ids_by_name(self, name: str) -> frozenset[int]:
+        """Ids of activities named ``name``, ignoring case."""
+        return self._ids_by_name.get(name.casefold(), frozenset())
+
+    def descendants(self, pk: int) -> frozenset[int]:
+        """The activity and its descendants down to ``depth`` levels."""
+        return self._descendants.get(pk, frozenset())
+
+    def subtree_by_name(self, name: str) -> frozenset[int] | None:
+        """Descendant ids of every activity named ``name`` or None."""
+        ids = self.ids_by_name(name)
+        if not ids:
+            return None
+        return frozenset().union(*(self.descendants(pk) for pk in ids))
+
+    async def refresh(self, session: AsyncSession) -> None:
+        async with self._lock:
+            if not self.is_stale:  # Refreshed by a concurrent request.
+                return
+            stmt = select(func.count(), func.max(Activity.updated_at))
+            count, updated_at = (await session.execute(stmt)).one()
+            version = f"{count}:{updated_at}"
+            if not self._stale and version == self.version:
+                self.checked_at = time.monotonic()
+                return
+            stmt = select(
+                Activity.id, Activity.parent_id, Activity.name
+            ).order_by(Activity.id)
+            result = await session.execute(stmt)
+            self.load(result.all(), version)
+
+    def load(self, rows, version: str | None = None) -> None:
+        """Rebuild from ``(id, parent_id, name)`` rows."""
+        self._stale = False
+        self.checked_at = time.monotonic()
+
+        children = defaultdict(list)
+        ids_by_name = defaultdict(set)
+        for pk, parent_id, name in rows:
+            children[parent_id].append(pk)
+            ids_by_name[name.casefold()].add(pk)
+
+        descendants = {}
+        for pk, _, _ in rows:
+            found, level = {pk}, [pk]
+            for _ in range(self.depth):
+                level = [child for i in level for child in children[i]]
+                found.update(level)
+            descendants[pk] = frozenset(found)
+
+        self._ids_by_name = {
+            name: frozenset(ids) for name, ids in ids_by_name.items()
+        }
+        self._descendants = descendants
+        self.version = version
+        logger.info(f"Activity taxonomy loaded, version {version}")
+
+
+_taxonomy: ActivityTaxonomy | None = None
+
+
+def get_activity_taxonomy() -> ActivityTaxonomy:
+    global _taxonomy
+    if _taxonomy is None:
+        config = get_current_config()
+        _taxonomy = ActivityTaxonomy(config.ACTIVITY_TAXONOMY_CHECK_INTERVAL)
+    return _taxonomy
+
+
+def invalidate_activity_taxonomy(*args) -> None:
+    if _taxonomy is not None:
+        _taxonomy.invalidate()
+
+
+def invalidate_activity_taxonomy_on_bulk(state: ORMExecuteState) -> None:
+    if state.is_select or state.bind_mapper is None:
+        return
+    if state.bind_mapper.class_ is Activity:
+        invalidate_activity_taxonomy()
+
+
+for name in ("after_insert", "after_update", "after_delete"):
+    event.listen(Activity, name, invalidate_activity_taxonomy)
+event.listen(Session, "do_orm_execute", invalidate_activity_taxonomy_on_bulk)
@@ -15,3 +15,8 @@ class ChildrenCategories(StrEnum):
     WASHING_VEHICLE_ACTIVITY = "Мойка"
     PARTS_VEHICLE_ACTIVITY = "Запчасти"
     ACCESSORIES_VEHICLE_ACTIVITY = "Аксессуары"
+
+
+class CompanySort(StrEnum):
+    NAME = "name"
+    DISTANCE = "distance"
@@ -0,0 +1,20 @@
+import hashlib
+
+from pydantic import BaseModel
+
+
+def strong_etag(model: BaseModel) -> str:
+    """Strong ETag of the JSON representation of ``model``."""
+    digest = hashlib.sha256(model.model_dump_json().encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Whether an ``If-None-Match`` header value matches ``etag``."""
+    if not if_none_match:
+        return False
+    # If-None-Match uses the weak comparison, W/ prefixes are ignored.
+    candidates = {
+        i.strip().removeprefix("W/") for i in if_none_match.split(",")
+    }
+    return "*" in candidates or etag in candidates
@@ -2,7 +2,13 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
-from app.connectors.sql import get_sync_session_factory
+from app.connectors.sql import (
+    async_registry,
+    get_async_session_factory,
+    get_sync_session_factory,
+)
+from app.services.geo_engine import get_geo_engine
+from app.services.taxonomy import get_activity_taxonomy
 from app.settings import setup_logger
 from app.test_data import load_test_data
 
@@ -12,4 +18,11 @@ async def lifespan(app: FastAPI):
     setup_logger()
     with get_sync_session_factory() as session:
         load_test_data(session)
+    await async_registry.connect()
+    async with get_async_session_factory() as session:
+        await get_activity_taxonomy().refresh(session)
+    if geo_engine := get_geo_engine():
+        async with get_async_session_factory() as session:
+            await geo_engine.refresh(session)
     yield
+    await async_registry.dispose()
@@ -0,0 +1,129 @@
+import time
+from logging import getLogger
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.services.metrics import (
+    RequestQueries,
+    current_request_queries,
+    http_request_duration,
+    http_requests,
+)
+from app.settings import get_current_config
+
+logger = getLogger("build-system")
+
+
+class MetricsMiddleware:
+    """Count requests and observe their latency by route template.
+
+    The route is taken from the scope after routing, so path parameters
+    do not make new label values. Unmatched paths share one label.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path_format", "unmatched")
+            method = scope["method"]
+            http_request_duration.observe(
+                time.perf_counter() - start, method, path
+            )
+            http_requests.inc(method, path, str(status))
+
+
+class QueryAccountingMiddleware:
+    """Count and time the SQL statements of every request.
+
+    Adds a ``Server-Timing`` header with database, serialization and the
+    remaining application time up to the response start. Logs a warning
+    when a request runs more than ``query_budget`` statements or the same
+    statement shape ``repeated_statement_threshold`` times or more, the
+    usual sign of an N+1 query.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        query_budget: int | None = None,
+        repeated_statement_threshold: int | None = None,
+    ):
+        config = get_current_config()
+        self.app = app
+        self.query_budget = (
+            config.SQL_QUERY_BUDGET if query_budget is None else query_budget
+        )
+        self.repeated_statement_threshold = (
+            config.SQL_REPEATED_STATEMENT_THRESHOLD
+            if repeated_statement_threshold is None
+            else repeated_statement_threshold
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        queries = RequestQueries()
+        token = current_request_queries.set(queries)
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing",
+                    server_timing(queries, time.perf_counter() - start),
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request_queries.reset(token)
+            self.check(scope, queries)
+
+    def check(self, scope: Scope, queries: RequestQueries) -> None:
+        request = f"{scope['method']} {scope['path']}"
+        if queries.count > self.query_budget:
+            logger.warning(
+                f"{request} ran {queries.count} SQL statements, "
+                f"budget is {self.query_budget}"
+            )
+        for shape, count in queries.shapes.most_common():
+            if count < self.repeated_statement_threshold:
+                break
+            logger.warning(
+                f"{request} ran the same statement {count} times: {shape}"
+            )
+
+
+def server_timing(queries: RequestQueries, total: float) -> str:
+    app_time = max(total - queries.db_time - queries.serialize_time, 0)
+    return ", ".join(
+        (
+            f'db;dur={queries.db_time * 1000:.2f};desc="{queries.count} '
+            'queries"',
+            f"app;dur={app_time * 1000:.2f}",
+            f"serialize;dur={queries.serialize_time * 1000:.2f}",
+        )
+    )
@@ -0,0 +1,29 @@
+import time
+from typing import Any
+
+from pydantic import BaseModel
+from pydantic_core import to_json
+from starlette.responses import JSONResponse
+
+from app.services.metrics import current_request_queries
+
+
+class ModelResponse(JSONResponse):
+    """JSON response rendered directly from an already built model.
+
+    FastAPI returns ``Response`` instances as is, so endpoints returning
+    ``ModelResponse`` skip the second validation against
+    ``response_model`` and the ``jsonable_encoder`` pass. The model is
+    serialized once by pydantic-core. ``response_model`` is still set on
+    the routes for the OpenAPI schema.
+    """
+
+    def render(self, content: Any) -> bytes:
+        start = time.perf_counter()
+        if isinstance(content, BaseModel):
+            body = to_json(content)
+        else:
+            body = super().render(content)
+        if (queries := current_request_queries.get()) is not None:
+            queries.serialize_time += time.perf_counter() - start
+        return body
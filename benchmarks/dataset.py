@@ -0,0 +1,201 @@
+"""Deterministic synthetic dataset of companies.
+
+The same size and seed always give the same data: a 3-level activity
+tree, addresses clustered around a few cities and shared by several
+companies, one to three phone numbers and activities per company.
+
+``prepare`` migrates a database with Alembic and fills it, for the
+benchmarks that run against a real schema.
+
+Run:
+    python -m benchmarks.dataset --size 100000 --output companies.ndjson
+    python -m benchmarks.dataset --size 100000 --url sqlite:///bench.db
+"""
+
+import argparse
+import random
+from collections.abc import Iterator
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, delete, insert, make_url
+from sqlalchemy.orm import Session
+
+from app.models import (
+    Activity,
+    Address,
+    Company,
+    PhoneNumber,
+    company_activities,
+)
+from app.schemas.companies import Company as CompanySchema
+from app.services.importer import CompanyImporter
+from app.settings import BASE_DIR
+
+CITIES = (
+    # Name, latitude, longitude, share of companies.
+    ("Москва", 55.7558, 37.6173, 0.35),
+    ("Санкт-Петербург", 59.9343, 30.3351, 0.2),
+    ("Новосибирск", 55.0302, 82.9204, 0.1),
+    ("Екатеринбург", 56.8389, 60.6057, 0.1),
+    ("Казань", 55.7887, 49.1221, 0.1),
+    ("Нижний Новгород", 56.3269, 44.0059, 0.08),
+    ("Владивосток", 43.1155, 131.8855, 0.07),
+)
+ROOT_ACTIVITIES = (
+    "Еда",
+    "Автомобили",
+    "Строительство",
+    "Медицина",
+    "Образование",
+    "Одежда",
+    "Электроника",
+    "Услуги",
+)
+CHILDREN_PER_ACTIVITY = 4
+NAME_FORMS = ("ООО", "АО", "ИП", "ПАО")
+NAME_WORDS = (
+    "Альфа",
+    "Вектор",
+    "Гранит",
+    "Диалог",
+    "Заря",
+    "Исток",
+    "Кристалл",
+    "Лидер",
+    "Меридиан",
+    "Нева",
+    "Орион",
+    "Полюс",
+    "Радуга",
+    "Сибирь",
+    "Титан",
+    "Уют",
+    "Феникс",
+    "Эталон",
+)
+STREETS = ("ул. Ленина", "Невский проспект", "ул. Мира", "ул. Гагарина")
+COMPANIES_PER_ADDRESS = 3
+SYNC_DRIVERS = {"aiosqlite": "", "asyncpg": "psycopg2"}
+
+
+def activity_tree() -> list[dict]:
+    """Rows of the activity table, parents before children."""
+    rows = []
+    for root in ROOT_ACTIVITIES:
+        rows.append({"id": len(rows) + 1, "name": root, "parent_id": None})
+        root_id = len(rows)
+        for i in range(1, CHILDREN_PER_ACTIVITY + 1):
+            name = f"{root} {i}"
+            rows.append(
+                {"id": len(rows) + 1, "name": name, "parent_id": root_id}
+            )
+            child_id = len(rows)
+            for j in range(1, CHILDREN_PER_ACTIVITY + 1):
+                rows.append(
+                    {
+                        "id": len(rows) + 1,
+                        "name": f"{name}.{j}",
+                        "parent_id": child_id,
+                    }
+                )
+    return rows
+
+
+def street(index: int) -> str:
+    """Street part of the address with ``index``, unique in the dataset."""
+    return f"{STREETS[index % len(STREETS)]} {index}"
+
+
+def company_name(pk: int) -> str:
+    form = NAME_FORMS[pk % len(NAME_FORMS)]
+    word = NAME_WORDS[pk * 7 % len(NAME_WORDS)]
+    return f'{form} "{word} {pk}"'
+
+
+def companies(size: int, seed: int = 0) -> Iterator[CompanySchema]:
+    """``size`` companies with ids from 1 to ``size``."""
+    rng = random.Random(seed)
+    activities = [row["name"] for row in activity_tree()]
+    weights = [share for *_, share in CITIES]
+    addresses = []
+    for index in range(size // COMPANIES_PER_ADDRESS + 1):
+        city, lat, long, _ = rng.choices(CITIES, weights)[0]
+        addresses.append(
+            (
+                f"г. {city}, {street(index)}",
+                rng.gauss(lat, 0.1),
+                rng.gauss(long, 0.15),
+            )
+        )
+    for pk in range(1, size + 1):
+        address, lat, long = rng.choice(addresses)
+        yield CompanySchema(
+            id=pk,
+            name=company_name(pk),
+            address=address,
+            latitude=lat,
+            longitude=long,
+            phone_numbers=[
+                f"8-{rng.randrange(900, 1000)}-{rng.randrange(10**7):07}"
+                for _ in range(rng.randint(1, 3))
+            ],
+            activities=rng.sample(activities, rng.randint(1, 3)),
+        )
+
+
+def populate(session: Session, size: int, seed: int = 0) -> None:
+    """Replace every row of the schema with the generated dataset."""
+    session.execute(delete(PhoneNumber))
+    session.execute(delete(company_activities))
+    session.execute(delete(Company))
+    session.execute(delete(Activity))
+    session.execute(delete(Address))
+    session.execute(insert(Activity), activity_tree())
+    session.commit()
+    CompanyImporter(session).run(companies(size, seed))
+
+
+def prepare(url: str, size: int, seed: int = 0) -> None:
+    """Migrate the database at the async ``url`` and fill it."""
+    url = make_url(url)
+    driver = SYNC_DRIVERS.get(url.get_driver_name(), url.get_driver_name())
+    sync_url = url.set(
+        drivername=f"{url.get_backend_name()}+{driver}".rstrip("+")
+    ).render_as_string(hide_password=False)
+    alembic_cfg = Config(BASE_DIR / "alembic.ini")
+    alembic_cfg.set_main_option(
+        "script_location", f"{BASE_DIR}/app/migrations"
+    )
+    alembic_cfg.attributes["sqlalchemy.url"] = sync_url
+    command.upgrade(alembic_cfg, "head")
+    engine = create_engine(sync_url)
+    with Session(engine) as session:
+        populate(session, size, seed)
+    engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--output", type=Path, help="NDJSON file")
+    target.add_argument(
+        "--url", help="Sync database URL with migrated schema, it is wiped"
+    )
+    args = parser.parse_args()
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as file:
+            for company in companies(args.size, args.seed):
+                file.write(company.model_dump_json() + "\n")
+        return
+    engine = create_engine(args.url)
+    with Session(engine) as session:
+        populate(session, args.size, args.seed)
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Geo search benchmark: SQL path against the in-memory geo engine.
+
+Migrates a temporary SQLite database, fills it with the synthetic dataset
+of N companies and measures ``SearchService.find_companies_by_geo`` and
+``find_nearest_companies`` with and without ``GeoEngine``.
+
+Run:
+    python -m benchmarks.geo_engine --sizes 10000 100000 1000000
+"""
+
+import os
+
+os.environ.setdefault("ENV", "test")
+
+import argparse
+import asyncio
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.services.errors import CompanyNotFoundError
+from app.services.geo_engine import GeoEngine
+from app.services.search_service import SearchService
+from benchmarks.dataset import CITIES, prepare
+
+
+async def measure(call, queries) -> float:
+    """Mean milliseconds per query."""
+    timings = []
+    for args in queries:
+        start = time.perf_counter()
+        try:
+            await call(*args)
+        except CompanyNotFoundError:
+            pass
+        timings.append(time.perf_counter() - start)
+    return statistics.mean(timings) * 1000
+
+
+async def run(size: int, queries: int, radius: int, limit: int) -> None:
+    rng = random.Random(size)
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite+aiosqlite:///{Path(directory) / 'geo.db'}"
+        prepare(url, size)
+        engine = create_async_engine(url)
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+        weights = [share for *_, share in CITIES]
+        points = [
+            (rng.gauss(lat, 0.1), rng.gauss(long, 0.15))
+            for _, lat, long, _ in rng.choices(CITIES, weights, k=queries)
+        ]
+
+        geo_engine = GeoEngine(None, session_factory)
+        start = time.perf_counter()
+        async with session_factory() as session:
+            await geo_engine.refresh(session)
+        load_ms = (time.perf_counter() - start) * 1000
+
+        async with session_factory() as session:
+            sql = SearchService(session)
+            in_memory = SearchService(session, geo_engine)
+            radius_queries = [(lat, long, radius) for lat, long in points]
+            nearest_queries = [(lat, long, limit) for lat, long in points]
+            results = {
+                "radius, sql": await measure(
+                    sql.find_companies_by_geo, radius_queries
+                ),
+                "radius, engine": await measure(
+                    in_memory.find_companies_by_geo, radius_queries
+                ),
+                "radius, engine lookup only": await measure(
+                    _sync(geo_engine.within_radius), radius_queries
+                ),
+                "nearest, sql": await measure(
+                    sql.find_nearest_companies, nearest_queries
+                ),
+                "nearest, engine": await measure(
+                    in_memory.find_nearest_companies, nearest_queries
+                ),
+                "nearest, engine lookup only": await measure(
+                    _sync(geo_engine.nearest), nearest_queries
+                ),
+            }
+        await engine.dispose()
+
+    print(f"\n{size} companies, engine load {load_ms:.0f} ms")
+    for name, value in results.items():
+        print(f"  {name:<30} {value:10.3f} ms/query")
+
+
+def _sync(function):
+    async def wrapper(*args):
+        return function(*args)
+
+    return wrapper
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--radius", type=int, default=2)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+    for size in args.sizes:
+        asyncio.run(run(size, args.queries, args.radius, args.limit))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Bulk import benchmark: ORM objects one by one against CompanyImporter.
+
+Writes N companies of the synthetic dataset to an NDJSON file and loads
+them into a temporary SQLite database twice: with ``session.add_all`` of
+ORM objects, the way ``load_test_data`` does it, and with
+``CompanyImporter``. The import is then repeated to measure the upsert of
+already known ids.
+
+Run:
+    python -m benchmarks.importer --sizes 10000 100000
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.models import Activity, Address, Company, PhoneNumber
+from app.models.abc import BaseModel
+from app.services.importer import CompanyImporter, read_ndjson
+from benchmarks.dataset import companies
+
+
+def generate(path: Path, size: int) -> None:
+    with open(path, "w", encoding="utf-8") as file:
+        for company in companies(size, seed=size):
+            file.write(company.model_dump_json() + "\n")
+
+
+def orm_objects(session: Session, path: Path) -> None:
+    addresses, activities = {}, {}
+    for record in read_ndjson(path):
+        address = addresses.get(record.address)
+        if address is None:
+            address = addresses[record.address] = Address(
+                address=record.address,
+                latitude=record.latitude,
+                longitude=record.longitude,
+            )
+        company = Company(id=record.id, name=record.name, address=address)
+        company.phone_numbers = [
+            PhoneNumber(number=number) for number in record.phone_numbers
+        ]
+        company.activities = [
+            activities.setdefault(name, Activity(name=name))
+            for name in record.activities
+        ]
+        session.add(company)
+    session.commit()
+
+
+def measure(url: str, load) -> float:
+    engine = create_engine(url)
+    BaseModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        start = time.perf_counter()
+        load(session)
+        seconds = time.perf_counter() - start
+    engine.dispose()
+    return seconds
+
+
+def run(size: int, chunk_size: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "companies.ndjson"
+        generate(path, size)
+
+        def bulk(session: Session) -> None:
+            CompanyImporter(session, chunk_size).run(read_ndjson(path))
+
+        url = f"sqlite:///{Path(directory) / 'import.db'}"
+        results = {
+            "orm add_all": measure(
+                f"sqlite:///{Path(directory) / 'orm.db'}",
+                lambda session: orm_objects(session, path),
+            ),
+            "importer, empty database": measure(url, bulk),
+            "importer, upsert of same ids": measure(url, bulk),
+        }
+
+    print(f"\n{size} companies, chunks of {chunk_size}")
+    for name, seconds in results.items():
+        print(f"  {name:<30} {seconds:8.2f} s {size / seconds:10.0f} rows/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000])
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    args = parser.parse_args()
+    for size in args.sizes:
+        run(size, args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
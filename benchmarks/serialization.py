@@ -0,0 +1,86 @@
+"""Serialization benchmark for ``Companies`` responses.
+
+Compares the default FastAPI path (validation against ``response_model``,
+``jsonable_encoder`` and ``json.dumps``) with ``ModelResponse`` that
+serializes the already built model once with pydantic-core.
+
+Run:
+    python -m benchmarks.serialization --sizes 1000 10000
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.schemas.companies import Companies, Company
+from app.utils.responses import ModelResponse
+
+
+def build_companies(size: int) -> Companies:
+    return Companies(
+        companies=[
+            Company(
+                id=pk,
+                name=f"ООО Компания {pk}",
+                address=f"г. Москва, ул. Ленина {pk}",
+                phone_numbers=["8-800-555-35-35", f"2-222-{pk:06d}"],
+                latitude=55.7558,
+                longitude=37.6173,
+                activities=["Еда", "Молочная продукция"],
+            )
+            for pk in range(1, size + 1)
+        ],
+    )
+
+
+async def fastapi_default(field, companies: Companies) -> bytes:
+    content = await serialize_response(field=field, response_content=companies)
+    return JSONResponse(content).body
+
+
+async def model_response(field, companies: Companies) -> bytes:
+    return ModelResponse(companies).body
+
+
+async def measure(render, field, companies: Companies, rounds: int) -> float:
+    """Mean milliseconds per render."""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        await render(field, companies)
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+async def run(size: int, rounds: int) -> None:
+    field = create_model_field(
+        name="Response_Companies", type_=Companies, mode="serialization"
+    )
+    companies = build_companies(size)
+    assert json.loads(await fastapi_default(field, companies)) == json.loads(
+        await model_response(field, companies)
+    )
+
+    before = await measure(fastapi_default, field, companies, rounds)
+    after = await measure(model_response, field, companies, rounds)
+    per_thousand = 1000 / size
+    print(f"\n{size} companies")
+    print(f"  response_model + JSONResponse {before * per_thousand:8.3f} ms")
+    print(f"  ModelResponse                 {after * per_thousand:8.3f} ms")
+    print(f"  (per 1000 companies), speedup x{before / after:.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    for size in args.sizes:
+        asyncio.run(run(size, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,13 @@ import pytest
 from alembic import command
 from alembic.config import Config
 from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event
 
-from app.connectors.sql import get_sync_session_factory
+from app.connectors.sql import (
+    async_registry,
+    get_async_read_session_factory,
+    get_sync_session_factory,
+)
 from app.main import app
 from app.settings import BASE_DIR, get_current_config
 from app.test_data import load_test_data
@@ -31,3 +36,24 @@ def lifespan_for_tests():
     # Upload data.
     with get_sync_session_factory() as session:
         load_test_data(session)
+
+
+@pytest.fixture
+def executed_statements():
+    """SQL statements sent through the shared async engine during a test."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = async_registry.engine.sync_engine
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.fixture
+async def session():
+    """Read only session closed after the test, as one of a request."""
+    async with get_async_read_session_factory() as session:
+        yield session
@@ -0,0 +1,262 @@
+import asyncio
+
+import pytest
+from sqlalchemy import delete, select, update
+
+from app.connectors.sql import (
+    get_async_session_factory,
+    get_sync_session_factory,
+)
+from app.models import Activity, Company, company_activities
+from app.services import facets as facets_module
+from app.services import taxonomy as taxonomy_module
+from app.services.facets import ActivityFacets
+from app.services.search_service import SearchService
+from app.services.single_flight import SingleFlight
+from app.services.taxonomy import ActivityTaxonomy
+from app.utils.enum import ChildrenCategories, MainCategories
+
+DEEP_ACTIVITIES = ("Говядина", "Стейки", "Рибай")
+
+
+@pytest.fixture
+def deep_activity_tree():
+    """Adds three levels under "Мясная продукция", one beyond the limit."""
+    with get_sync_session_factory() as session:
+        parent = session.scalars(
+            select(Activity).where(
+                Activity.name == ChildrenCategories.MEAT_ACTIVITY
+            )
+        ).one()
+        companies = []
+        for name in DEEP_ACTIVITIES:
+            parent = Activity(name=name, parent=parent)
+            companies.append(
+                Company(name=f"ООО {name}", address_id=1, activities=[parent])
+            )
+        session.add_all(companies)
+        session.commit()
+        ids = {company.name: company.id for company in companies}
+        yield ids
+
+        activity_ids = session.scalars(
+            select(Activity.id).where(Activity.name.in_(DEEP_ACTIVITIES))
+        ).all()
+        session.execute(
+            delete(company_activities).where(
+                company_activities.c.activity_id.in_(activity_ids)
+            )
+        )
+        session.execute(delete(Company).where(Company.id.in_(ids.values())))
+        for name in reversed(DEEP_ACTIVITIES):
+            session.execute(delete(Activity).where(Activity.name == name))
+        session.commit()
+
+
+@pytest.mark.parametrize("taxonomy", (None, ActivityTaxonomy()))
+async def test_activity_depth_limited_to_three_levels(
+    taxonomy,
+    deep_activity_tree,
+    session,
+):
+    service = SearchService(session, taxonomy=taxonomy)
+    result = await service.find_company_by_activity(MainCategories.FOOD)
+    ids = {company.id for company in result.companies}
+    assert deep_activity_tree["ООО Говядина"] in ids
+    assert deep_activity_tree["ООО Стейки"] in ids
+    assert deep_activity_tree["ООО Рибай"] not in ids
+
+
+async def test_activity_search_query_count_is_constant(
+    deep_activity_tree,
+    executed_statements,
+    session,
+):
+    service = SearchService(session)
+    counts = []
+    for activity in (MainCategories.FOOD, "Говядина", "Рибай"):
+        executed_statements.clear()
+        await service.find_company_by_activity(activity)
+        counts.append(len(executed_statements))
+    assert len(set(counts)) == 1
+
+
+async def test_identical_concurrent_searches_coalesced(
+    executed_statements,
+    session,
+):
+    single_flight = SingleFlight()
+    service = SearchService(session, single_flight=single_flight)
+    await service.find_company_by_activity(MainCategories.FOOD)
+    expected = len(executed_statements)
+
+    executed_statements.clear()
+    first, second, third = await asyncio.gather(
+        service.find_company_by_activity(MainCategories.FOOD),
+        service.find_company_by_activity(MainCategories.FOOD, limit=50),
+        service.find_company_by_activity(activity=MainCategories.FOOD),
+    )
+    assert first is second is third
+    assert len(executed_statements) == expected
+    assert single_flight.coalesced["find_company_by_activity"] == 2
+    # The shared calls ran on sessions of their own.
+    assert not session.in_transaction()
+
+
+async def test_taxonomy_search_skips_activity_queries(
+    executed_statements, session
+):
+    taxonomy = ActivityTaxonomy()
+    service = SearchService(session, taxonomy=taxonomy)
+    await service.find_company_by_activity(MainCategories.FOOD)
+
+    executed_statements.clear()
+    result = await service.find_company_by_activity(
+        MainCategories.FOOD.upper()
+    )
+    assert len(result.companies) == 2
+    assert not any("activity_tree" in i for i in executed_statements)
+
+
+async def test_taxonomy_invalidated_on_activity_change(monkeypatch):
+    taxonomy = ActivityTaxonomy()
+    monkeypatch.setattr(taxonomy_module, "_taxonomy", taxonomy)
+    async with get_async_session_factory() as session:
+        await taxonomy.refresh(session)
+    version = taxonomy.version
+    assert not taxonomy.is_stale
+
+    with get_sync_session_factory() as session:
+        session.add(Activity(name="Рыба"))
+        session.commit()
+        assert taxonomy.is_stale
+        async with get_async_session_factory() as async_session:
+            await taxonomy.refresh(async_session)
+        assert taxonomy.version != version
+        assert taxonomy.subtree_by_name("рыба")
+
+        session.execute(delete(Activity).where(Activity.name == "Рыба"))
+        session.commit()
+    assert taxonomy.is_stale
+
+
+FACETS_URL = "/api/v1/companies/facets/activities"
+
+
+def facet_counts(facets: list[dict]) -> dict[str, int]:
+    counts = {}
+    for facet in facets:
+        counts[facet["name"]] = facet["count"]
+        counts.update(facet_counts(facet["children"]))
+    return counts
+
+
+async def test_activity_facets(client):
+    response = await client.get(FACETS_URL)
+    assert response.status_code == 200
+    facets = response.json()["activities"]
+    assert [i["name"] for i in facets] == [
+        MainCategories.FOOD,
+        MainCategories.VEHICLE,
+    ]
+    assert facet_counts(facets) == {
+        # "ООО Рога и Копыта" has both meat and milk, counted once.
+        MainCategories.FOOD: 2,
+        ChildrenCategories.MEAT_ACTIVITY: 2,
+        ChildrenCategories.MILK_ACTIVITY: 1,
+        MainCategories.VEHICLE: 3,
+        ChildrenCategories.WASHING_VEHICLE_ACTIVITY: 1,
+        ChildrenCategories.PARTS_VEHICLE_ACTIVITY: 1,
+        ChildrenCategories.ACCESSORIES_VEHICLE_ACTIVITY: 2,
+    }
+
+
+async def test_activity_facets_within_radius(client):
+    params = {"latitude": 59.934190, "longitude": 30.332707, "radius": 1}
+    response = await client.get(FACETS_URL, params=params)
+    counts = facet_counts(response.json()["activities"])
+    assert counts[MainCategories.FOOD] == 0
+    assert counts[MainCategories.VEHICLE] == 3
+
+    del params["radius"]
+    response = await client.get(FACETS_URL, params=params)
+    assert response.status_code == 422
+
+
+async def test_taxonomy_reloaded_when_version_differs(executed_statements):
+    # Not the shared instance, so it only sees changes by its checks.
+    taxonomy = ActivityTaxonomy(check_interval=0)
+    async with get_async_session_factory() as session:
+        await taxonomy.refresh(session)
+        executed_statements.clear()
+        await taxonomy.refresh(session)
+        assert len(executed_statements) == 1
+
+        with get_sync_session_factory() as sync_session:
+            activity = sync_session.scalar(
+                select(Activity).where(Activity.name == "Мойка")
+            )
+            activity.name = "Мойка машин"
+            sync_session.commit()
+            await taxonomy.refresh(session)
+            assert taxonomy.subtree_by_name("мойка машин")
+
+            activity.name = "Мойка"
+            sync_session.commit()
+
+
+async def test_activity_facets_rebuilt_on_link_change(
+    monkeypatch,
+    executed_statements,
+    session,
+):
+    facets = ActivityFacets()
+    monkeypatch.setattr(facets_module, "_activity_facets", facets)
+    service = SearchService(session, facets=facets)
+    await service.count_companies_by_activity()
+    executed_statements.clear()
+    result = await service.count_companies_by_activity()
+    assert executed_statements == []
+    assert facet_counts(result.model_dump()["activities"])["Мойка"] == 1
+
+    with get_sync_session_factory() as sync_session:
+        company = sync_session.get(Company, 3)
+        washing = sync_session.scalar(
+            select(Activity).where(Activity.name == "Мойка")
+        )
+        company.activities.append(washing)
+        sync_session.commit()
+        assert facets.is_stale
+        # The stale tree is served while it is rebuilt in the background.
+        result = await service.count_companies_by_activity()
+        assert facet_counts(result.model_dump()["activities"])["Мойка"] == 1
+        await facets.rebuilding
+        assert not facets.is_stale
+        result = await service.count_companies_by_activity()
+        assert facet_counts(result.model_dump()["activities"])["Мойка"] == 2
+
+        company.activities.remove(washing)
+        sync_session.commit()
+    assert facets.is_stale
+
+
+async def test_activity_facets_kept_on_unrelated_changes(monkeypatch):
+    facets = ActivityFacets()
+    monkeypatch.setattr(facets_module, "_activity_facets", facets)
+    async with get_async_session_factory() as session:
+        await facets.tree(session)
+        company = await session.get(Company, 3)
+        company.name = "Кореана 2"
+        await session.flush()
+        await session.execute(
+            update(Company).where(Company.id == 3).values(name="Кореана 3")
+        )
+        assert not facets.is_stale
+
+        await session.execute(
+            delete(company_activities).where(
+                company_activities.c.company_id == 3
+            )
+        )
+        assert facets.is_stale
+        await session.rollback()
@@ -0,0 +1,36 @@
+from httpx import AsyncClient
+from starlette.status import (
+    HTTP_200_OK,
+    HTTP_401_UNAUTHORIZED,
+    HTTP_429_TOO_MANY_REQUESTS,
+)
+
+from app.services import rate_limit
+from app.services.rate_limit import RateLimiter
+
+
+async def test_every_configured_key_is_accepted(client: AsyncClient):
+    url = "/api/v1/companies/1"
+    for key, status in (
+        ("qwerty", HTTP_200_OK),
+        ("asdfgh", HTTP_200_OK),
+        ("zxcvbn", HTTP_401_UNAUTHORIZED),
+    ):
+        response = await client.get(url=url, headers={"x-api-key": key})
+        assert response.status_code == status
+
+
+async def test_rate_limit_per_key(client: AsyncClient, monkeypatch):
+    monkeypatch.setattr(
+        rate_limit, "_rate_limiter", RateLimiter(rate=0.01, burst=2)
+    )
+    url = "/api/v1/companies/1"
+    for _ in range(2):
+        response = await client.get(url=url)
+        assert response.status_code == HTTP_200_OK
+    response = await client.get(url=url)
+    assert response.status_code == HTTP_429_TOO_MANY_REQUESTS
+    assert int(response.headers["retry-after"]) > 0
+
+    response = await client.get(url=url, headers={"x-api-key": "asdfgh"})
+    assert response.status_code == HTTP_200_OK
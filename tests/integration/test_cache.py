@@ -0,0 +1,35 @@
+from app.connectors.sql import get_sync_session_factory
+from app.models import Company, PhoneNumber
+from app.services import cache as cache_module
+from app.services.cache import LRUCache
+from app.services.search_service import SearchService
+
+
+async def test_company_cache_invalidated_on_change(monkeypatch, session):
+    cache = LRUCache(max_size=10)
+    monkeypatch.setattr(cache_module, "_company_cache", cache)
+    service = SearchService(session, company_cache=cache)
+
+    company = await service.find_company_by_id(3)
+    assert await service.find_company_by_id(3) is company
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    with get_sync_session_factory() as session:
+        phone = PhoneNumber(number="1-111-111", company_id=3)
+        session.add(phone)
+        session.commit()
+        assert cache.get(3) is None
+        updated = await service.find_company_by_id(3)
+        assert "1-111-111" in updated.phone_numbers
+
+        session.delete(phone)
+        session.commit()
+        assert cache.get(3) is None
+
+    await service.find_company_by_id(3)
+    with get_sync_session_factory() as session:
+        company = session.get(Company, 3)
+        company.name = f"{company.name} "
+        session.flush()
+        assert cache.get(3) is None
+        session.rollback()
@@ -1,9 +1,29 @@
+import json
+from datetime import UTC, datetime, timedelta, timezone
+from functools import partialmethod
+from operator import attrgetter
 from urllib.parse import quote
 
 import pytest
 from httpx import AsyncClient
-from starlette.status import HTTP_200_OK, HTTP_404_NOT_FOUND
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from starlette.status import (
+    HTTP_200_OK,
+    HTTP_304_NOT_MODIFIED,
+    HTTP_400_BAD_REQUEST,
+    HTTP_404_NOT_FOUND,
+    HTTP_422_UNPROCESSABLE_ENTITY,
+)
 
+from app.connectors.sql import get_async_session_factory
+from app.models import Activity, Company
+from app.schemas.companies import Company as CompanySchema
+from app.schemas.companies import SearchCompanies
+from app.services import search_service
+from app.services.company_search import search_statement
+from app.services.errors import CompanyNotFoundError, UnexpectedError
+from app.services.search_service import SearchService
 from app.utils.enum import ChildrenCategories, MainCategories
 
 
@@ -14,6 +34,45 @@ async def test_get_success_company_by_id(client: AsyncClient):
     assert company["id"] == 1
 
 
+async def test_company_loaded_with_one_statement(
+    executed_statements: list[str],
+    session,
+):
+    service = SearchService(session)
+    company = await service.find_company_by_id(1)
+    assert len(executed_statements) == 1
+    assert company.phone_numbers == [
+        "2-222-222",
+        "3-333-333",
+        "8-923-666-13-13",
+    ]
+    assert sorted(company.activities) == sorted(
+        (ChildrenCategories.MEAT_ACTIVITY, ChildrenCategories.MILK_ACTIVITY)
+    )
+
+
+async def test_company_arrays_ordered_by_id(session):
+    service = SearchService(session)
+    batch = await service.find_companies_by_ids(list(range(1, 10)))
+    async with get_async_session_factory() as orm_session:
+        for company in (i.company for i in batch.companies if i.found):
+            stored = await orm_session.get(
+                Company,
+                company.id,
+                options=[
+                    selectinload(Company.phone_numbers),
+                    selectinload(Company.activities),
+                ],
+            )
+            assert company.phone_numbers == [
+                i.number
+                for i in sorted(stored.phone_numbers, key=attrgetter("id"))
+            ]
+            assert company.activities == [
+                i.name for i in sorted(stored.activities, key=attrgetter("id"))
+            ]
+
+
 async def test_get_failed_company_by_id(client: AsyncClient):
     response = await client.get("/api/v1/companies/10")
     assert response.status_code == HTTP_404_NOT_FOUND
@@ -105,3 +164,484 @@ async def test_get_success_companies_by_geo(client: AsyncClient):
     assert response.status_code == 200
     companies = response.json()
     assert len(companies["companies"]) == 3
+    distances = [company["distance"] for company in companies["companies"]]
+    assert distances == sorted(distances)
+    assert all(0 <= distance <= 1 for distance in distances)
+
+
+@pytest.mark.parametrize(
+    ("latitude", "longitude", "radius", "count"),
+    (
+        (55.7558, 37.6173, 1, 1),  # г. Москва, ул. Ленина 1
+        (55.0302, 82.9204, 100, 1),  # г. Новосибирск, ул. Блюхера 32/1
+        (0.0, 0.0, 100, 0),
+    ),
+)
+async def test_companies_by_geo_bounding_box(
+    latitude: float,
+    longitude: float,
+    radius: int,
+    count: int,
+    client: AsyncClient,
+):
+    response = await client.post(
+        url="/api/v1/companies/search/by/geo/",
+        json={"latitude": latitude, "longitude": longitude, "radius": radius},
+    )
+    if not count:
+        assert response.status_code == HTTP_404_NOT_FOUND
+        return
+    assert response.status_code == HTTP_200_OK
+    companies = response.json()["companies"]
+    assert len(companies) == count
+    assert companies[0]["distance"] < 0.001
+
+
+async def test_get_success_nearest_companies(client: AsyncClient):
+    latitude, longitude = 59.934190, 30.332707  # Невский 35
+    response = await client.post(
+        url="/api/v1/companies/search/nearest/",
+        json={"latitude": latitude, "longitude": longitude, "limit": 4},
+    )
+    assert response.status_code == HTTP_200_OK
+    companies = response.json()["companies"]
+    assert len(companies) == 4
+    distances = [company["distance"] for company in companies]
+    assert distances == sorted(distances)
+    assert companies[-1]["address"] == "г. Москва, ул. Ленина 1"
+
+
+@pytest.mark.parametrize(
+    ("name", "expected"),
+    (
+        ("рога", ["ООО Рога и Копыта"]),
+        ("копыта", ["ООО Рога и Копыта"]),
+        ("Ги", ["Гидро"]),
+    ),
+)
+async def test_search_companies_by_name(
+    name: str,
+    expected: list[str],
+    client: AsyncClient,
+):
+    response = await client.get(
+        "/api/v1/companies/search/by/name", params={"name": name}
+    )
+    assert response.status_code == HTTP_200_OK
+    companies = response.json()["companies"]
+    assert sorted(company["name"] for company in companies) == sorted(expected)
+
+
+async def test_search_companies_by_name_ranked_and_paginated(
+    client: AsyncClient,
+):
+    url = "/api/v1/companies/search/by/name"
+    response = await client.get(url, params={"name": "Мясокомбинат"})
+    assert response.json()["companies"][0]["name"] == "ЗАО Мясокомбинат"
+
+    first = await client.get(url, params={"name": "Ко", "limit": 1})
+    cursor = first.json()["next_cursor"]
+    second = await client.get(
+        url, params={"name": "Ко", "limit": 1, "cursor": cursor}
+    )
+    assert len(first.json()["companies"]) == 1
+    assert len(second.json()["companies"]) == 1
+    assert second.json()["next_cursor"] is None
+    assert first.json()["companies"] != second.json()["companies"]
+
+    response = await client.get(url, params={"name": "SomeAnotherCompany"})
+    assert response.status_code == HTTP_404_NOT_FOUND
+
+
+async def collect_pages(client: AsyncClient, request) -> list[list[int]]:
+    pages, cursor = [], None
+    while True:
+        response = await request(cursor)
+        assert response.status_code == HTTP_200_OK
+        data = response.json()
+        pages.append([company["id"] for company in data["companies"]])
+        cursor = data["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+async def test_companies_by_activity_keyset_pages(client: AsyncClient):
+    url = f"/api/v1/companies/search/by/activity/{MainCategories.VEHICLE}"
+    full = await client.get(url)
+    pages = await collect_pages(
+        client,
+        lambda cursor: client.get(
+            url, params={"limit": 2} | ({"cursor": cursor} if cursor else {})
+        ),
+    )
+    assert [len(page) for page in pages] == [2, 1]
+    assert sum(pages, []) == [i["id"] for i in full.json()["companies"]]
+
+
+async def test_companies_by_address_keyset_pages(client: AsyncClient):
+    url = f"/api/v1/companies/search/by/address/{quote('Санкт-Петербург')}"
+    pages = await collect_pages(
+        client,
+        lambda cursor: client.get(
+            url, params={"limit": 1} | ({"cursor": cursor} if cursor else {})
+        ),
+    )
+    ids = sum(pages, [])
+    assert len(ids) == 3
+    assert ids == sorted(ids)
+
+
+async def test_companies_by_geo_keyset_pages(client: AsyncClient):
+    url = "/api/v1/companies/search/by/geo/"
+    body = {"latitude": 59.934190, "longitude": 30.332707, "radius": 1}
+    full = await client.post(url, json=body)
+    pages = await collect_pages(
+        client,
+        lambda cursor: client.post(
+            url, json=body | {"limit": 2, "cursor": cursor}
+        ),
+    )
+    assert [len(page) for page in pages] == [2, 1]
+    assert sum(pages, []) == [i["id"] for i in full.json()["companies"]]
+
+
+@pytest.mark.parametrize("cursor", ("broken", "WzEsMl0", "WyJhIl0"))
+async def test_invalid_cursor(cursor: str, client: AsyncClient):
+    response = await client.get(
+        f"/api/v1/companies/search/by/activity/{MainCategories.FOOD}",
+        params={"cursor": cursor},
+    )
+    assert response.status_code == HTTP_400_BAD_REQUEST
+
+
+async def test_company_by_id_etag(
+    client: AsyncClient,
+    executed_statements: list[str],
+):
+    response = await client.get("/api/v1/companies/2")
+    etag = response.headers["ETag"]
+    assert etag.startswith('"') and etag.endswith('"')
+
+    executed_statements.clear()
+    response = await client.get(
+        "/api/v1/companies/2", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == HTTP_304_NOT_MODIFIED
+    assert response.headers["ETag"] == etag
+    assert not response.content
+    assert not executed_statements  # Served from the cache.
+
+    response = await client.get(
+        "/api/v1/companies/2", headers={"If-None-Match": '"other"'}
+    )
+    assert response.status_code == HTTP_200_OK
+    assert response.json()["id"] == 2
+
+
+async def test_get_companies_batch(client: AsyncClient):
+    response = await client.post(
+        url="/api/v1/companies/batch", json={"ids": [3, 100, 1, 3]}
+    )
+    assert response.status_code == HTTP_200_OK
+    companies = response.json()["companies"]
+    assert [i["id"] for i in companies] == [3, 100, 1, 3]
+    assert [i["found"] for i in companies] == [True, False, True, True]
+    assert companies[1]["company"] is None
+    assert companies[2]["company"]["id"] == 1
+
+
+async def test_companies_batch_loaded_with_one_statement(
+    executed_statements: list[str],
+    session,
+):
+    service = SearchService(session)
+    batch = await service.find_companies_by_ids([5, 4, 3, 2, 1])
+    assert len(executed_statements) == 1
+    assert [i.company.id for i in batch.companies] == [5, 4, 3, 2, 1]
+
+
+@pytest.mark.parametrize("ids", [[], list(range(1, 12))])
+async def test_get_companies_batch_invalid_size(client: AsyncClient, ids):
+    response = await client.post(
+        url="/api/v1/companies/batch", json={"ids": ids}
+    )
+    assert response.status_code == HTTP_422_UNPROCESSABLE_ENTITY
+
+
+async def test_export_companies(client: AsyncClient):
+    response = await client.get(url="/api/v1/companies/export")
+    assert response.status_code == HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    companies = [json.loads(i) for i in response.text.splitlines()]
+    assert [i["id"] for i in companies] == [1, 2, 3, 4, 5]
+    assert companies[0]["phone_numbers"]
+
+
+async def test_export_companies_resumed_and_filtered(client: AsyncClient):
+    response = await client.get(
+        url="/api/v1/companies/export", params={"after_id": 3}
+    )
+    assert [json.loads(i)["id"] for i in response.text.splitlines()] == [4, 5]
+
+    tomorrow = datetime.utcnow() + timedelta(days=1)
+    response = await client.get(
+        url="/api/v1/companies/export",
+        params={"updated_since": tomorrow.isoformat()},
+    )
+    assert response.status_code == HTTP_200_OK
+    assert response.text == ""
+
+
+async def test_export_companies_streamed_in_chunks(session):
+    service = SearchService(session)
+    chunks = [
+        [company.id for company in chunk]
+        async for chunk in service.export_companies(chunk_size=2)
+    ]
+    assert chunks == [[1, 2], [3, 4], [5]]
+    # The export had a session of its own, the request one is still open.
+    assert (await service.find_company_by_id(1)).id == 1
+
+
+async def test_export_companies_failure_reported(
+    client: AsyncClient, monkeypatch
+):
+    def company(**fields):
+        if fields["id"] == 4:
+            raise RuntimeError("Lost connection")
+        return CompanySchema(**fields)
+
+    monkeypatch.setattr(search_service, "CompanySchema", company)
+    monkeypatch.setattr(
+        SearchService,
+        "export_companies",
+        partialmethod(SearchService.export_companies, chunk_size=2),
+    )
+    response = await client.get(url="/api/v1/companies/export")
+    assert response.status_code == HTTP_200_OK
+    *companies, error = [json.loads(i) for i in response.text.splitlines()]
+    assert [i["id"] for i in companies] == [1, 2]
+    assert error == {"error": UnexpectedError().detail, "after_id": 2}
+
+
+async def test_export_companies_updated_since_with_offset(
+    client: AsyncClient,
+):
+    # Test data is loaded when the tests start.
+    now = datetime.now(UTC)
+    for updated_since, expected in (
+        (now - timedelta(hours=1), 5),
+        (now + timedelta(hours=1), 0),
+    ):
+        for offset in (3, -5):
+            local = updated_since.astimezone(timezone(timedelta(hours=offset)))
+            response = await client.get(
+                url="/api/v1/companies/export",
+                params={"updated_since": local.isoformat()},
+            )
+            assert response.status_code == HTTP_200_OK
+            assert len(response.text.splitlines()) == expected
+
+
+async def test_company_touched_by_phone_and_activity_changes():
+    async with get_async_session_factory() as session:
+        company = await session.get(
+            Company,
+            1,
+            options=[
+                selectinload(Company.phone_numbers),
+                selectinload(Company.activities),
+            ],
+        )
+        company.updated_at = updated_at = datetime(2000, 1, 1)
+        await session.flush()
+
+        company.phone_numbers[0].number = "0-000-000"
+        await session.flush()
+        assert company.updated_at > updated_at
+
+        company.updated_at = updated_at
+        await session.flush()
+        activity = await session.scalar(
+            select(Activity).where(Activity.name == MainCategories.VEHICLE)
+        )
+        company.activities.append(activity)
+        await session.flush()
+        assert company.updated_at > updated_at
+        await session.rollback()
+
+
+SEARCH_URL = "/api/v1/companies/search"
+NEVSKY = {"latitude": 59.934190, "longitude": 30.332707, "radius": 1}
+
+
+async def test_combined_search(client: AsyncClient):
+    response = await client.post(
+        SEARCH_URL,
+        json={"activity": MainCategories.FOOD, "name": "Мясо"},
+    )
+    assert response.status_code == HTTP_200_OK
+    companies = response.json()["companies"]
+    assert [i["name"] for i in companies] == ["ЗАО Мясокомбинат"]
+    assert companies[0]["distance"] is None
+
+    response = await client.post(
+        SEARCH_URL,
+        json={"activity": MainCategories.VEHICLE, "geo": NEVSKY},
+    )
+    by_geo = await client.post("/api/v1/companies/search/by/geo/", json=NEVSKY)
+    assert response.json()["companies"] == by_geo.json()["companies"]
+
+    response = await client.post(
+        SEARCH_URL,
+        json={"address": "Невский", "geo": NEVSKY, "name": "Авто"},
+    )
+    assert response.status_code == HTTP_404_NOT_FOUND
+
+
+async def test_combined_search_pages_sorted_by_name(client: AsyncClient):
+    body = {"activity": MainCategories.VEHICLE, "geo": NEVSKY}
+    pages = await collect_pages(
+        client,
+        lambda cursor: client.post(
+            SEARCH_URL,
+            json=body | {"sort_by": "name", "limit": 2, "cursor": cursor},
+        ),
+    )
+    assert pages == [[5, 4], [3]]  # Автостиль, Гидро, Кореана
+
+
+@pytest.mark.parametrize(
+    "body",
+    (
+        {"sort_by": "distance"},
+        {"name": "Гидро", "cursor": "WzEsMl0"},  # [1, 2], not a name
+        {"name": ""},
+    ),
+)
+async def test_combined_search_invalid(client: AsyncClient, body: dict):
+    response = await client.post(SEARCH_URL, json=body)
+    assert response.status_code in (
+        HTTP_400_BAD_REQUEST,
+        HTTP_422_UNPROCESSABLE_ENTITY,
+    )
+
+
+async def test_combined_search_statement_cached_per_shape(
+    executed_statements: list[str],
+    session,
+):
+    service = SearchService(session)
+    search_statement.cache_clear()
+    for name in ("Гидро", "Кореана"):
+        result = await service.search_companies(
+            SearchCompanies(name=name, activity=MainCategories.VEHICLE)
+        )
+        assert [i.name for i in result.companies] == [name]
+    assert len(executed_statements) == 2
+    assert executed_statements[0] == executed_statements[1]
+    info = search_statement.cache_info()
+    assert (info.misses, info.hits) == (1, 1)
+
+
+@pytest.mark.parametrize(
+    ("limit", "ids"),
+    # Новосибирск is farther than NEAREST_MAX_RADIUS.
+    ((3, [4, 5, 3]), (4, [4, 5, 3, 1]), (10, [4, 5, 3, 1])),
+)
+async def test_nearest_companies_in_growing_circles(
+    executed_statements: list[str],
+    session,
+    limit: int,
+    ids: list[int],
+):
+    service = SearchService(session)
+    result = await service.find_nearest_companies(59.934190, 30.332707, limit)
+    assert [i.id for i in result.companies] == ids
+    if limit == 3:
+        # Dense centre, the first circle is enough.
+        assert len(executed_statements) == 1
+
+
+async def test_nearest_companies_in_empty_area(
+    executed_statements: list[str],
+    session,
+):
+    service = SearchService(session)
+    with pytest.raises(CompanyNotFoundError):
+        await service.find_nearest_companies(0, 0, 5)
+    # 1, 4, 16, 64, 256 and 1000 km, every one a bounded range scan.
+    assert len(executed_statements) == 6
+    assert all("addresses.latitude BETWEEN" in i for i in executed_statements)
+
+
+VIEWPORT_URL = "/api/v1/companies/search/by/viewport/"
+CENTRE = {  # Центр Санкт-Петербурга.
+    "min_latitude": 59.93,
+    "min_longitude": 30.32,
+    "max_latitude": 59.94,
+    "max_longitude": 30.34,
+}
+RUSSIA = {
+    "min_latitude": 40,
+    "min_longitude": 20,
+    "max_latitude": 70,
+    "max_longitude": 140,
+}
+
+
+async def test_viewport_companies_at_high_zoom(client: AsyncClient):
+    response = await client.post(VIEWPORT_URL, json=CENTRE | {"zoom": 16})
+    assert response.status_code == HTTP_200_OK
+    data = response.json()
+    assert [i["id"] for i in data["companies"]] == [3, 4, 5]
+    assert data["clusters"] == []
+
+
+async def test_viewport_clusters_at_low_zoom(client: AsyncClient):
+    response = await client.post(VIEWPORT_URL, json=RUSSIA | {"zoom": 3})
+    assert response.status_code == HTTP_200_OK
+    data = response.json()
+    assert data["companies"] == []
+    assert data["cell_size"] == 360 / 2**5
+    assert sorted(i["count"] for i in data["clusters"]) == [1, 1, 3]
+    petersburg = max(data["clusters"], key=lambda i: i["count"])
+    assert petersburg["latitude"] == pytest.approx(59.934, abs=0.001)
+
+
+async def test_viewport_clusters_bounded(
+    client: AsyncClient, executed_statements, monkeypatch
+):
+    monkeypatch.setattr(search_service, "VIEWPORT_MAX_COMPANIES", 2)
+    response = await client.post(VIEWPORT_URL, json=CENTRE | {"zoom": 16})
+    assert sum(i["count"] for i in response.json()["clusters"]) == 3
+    # Only ids are probed before clustering.
+    assert not any("phone_number_rows" in i for i in executed_statements)
+
+    world = {
+        "min_latitude": -90,
+        "min_longitude": -180,
+        "max_latitude": 90,
+        "max_longitude": 180,
+    }
+    response = await client.post(VIEWPORT_URL, json=world | {"zoom": 22})
+    data = response.json()
+    assert data["cell_size"] == 360 / 16
+    assert sum(i["count"] for i in data["clusters"]) == 5
+
+
+async def test_viewport_across_antimeridian(client: AsyncClient):
+    body = RUSSIA | {"min_longitude": 170, "max_longitude": 40, "zoom": 3}
+    response = await client.post(VIEWPORT_URL, json=body)
+    assert response.status_code == HTTP_200_OK
+    data = response.json()
+    # 230 degrees wide, cells are doubled to fit 16 across.
+    assert data["cell_size"] == 360 / 2**4
+    # Moscow and Petersburg in one cell, not Novosibirsk at 82.9.
+    assert [i["count"] for i in data["clusters"]] == [4]
+
+
+async def test_viewport_invalid(client: AsyncClient):
+    body = CENTRE | {"min_latitude": 60, "zoom": 3}
+    response = await client.post(VIEWPORT_URL, json=body)
+    assert response.status_code == HTTP_422_UNPROCESSABLE_ENTITY
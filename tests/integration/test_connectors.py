@@ -0,0 +1,101 @@
+import shutil
+
+import pytest
+from sqlalchemy import event, func, select
+
+from app.connectors.sql import (
+    AsyncEngineRegistry,
+    async_registry,
+    get_async_session_factory,
+)
+from app.models import Company
+from app.settings import BASE_DIR
+
+
+async def test_sessions_share_one_engine():
+    first = get_async_session_factory()
+    second = get_async_session_factory()
+    assert first is not second
+    assert first.bind is second.bind is async_registry.engine
+
+
+async def test_registry_warm_up_and_dispose():
+    await async_registry.connect()
+    engine = async_registry.engine
+    assert engine.pool.checkedout() == 0
+
+    await async_registry.dispose()
+    assert async_registry.engine is not engine
+
+
+@pytest.fixture
+async def replicated_registry(tmp_path):
+    urls = []
+    for name in ("first", "second"):
+        shutil.copy(BASE_DIR / "tests/integration/test.db", tmp_path / name)
+        urls.append(f"sqlite+aiosqlite:///{tmp_path / name}")
+    urls.append(f"sqlite+aiosqlite:///{tmp_path / 'missing/down.db'}")
+    registry = AsyncEngineRegistry(urls)
+    yield registry
+    await registry.dispose()
+
+
+async def test_reads_alternate_between_healthy_replicas(replicated_registry):
+    await replicated_registry.connect()
+    first, second, down = replicated_registry.replicas
+    assert first.healthy and second.healthy and not down.healthy
+
+    factories = [
+        replicated_registry.next_read_session_factory() for _ in range(4)
+    ]
+    assert factories == [first.session_factory, second.session_factory] * 2
+    async with factories[0]() as session:
+        assert await session.scalar(select(func.count(Company.id))) == 5
+
+
+async def test_reads_fall_back_to_primary(replicated_registry):
+    for replica in replicated_registry.replicas:
+        replica.max_lag = -1
+    await replicated_registry.connect()
+    assert not any(i.healthy for i in replicated_registry.replicas)
+    factory = replicated_registry.next_read_session_factory()
+    primary = replicated_registry.engine.sync_engine
+    assert factory.kw["bind"].sync_engine.pool is primary.pool
+
+
+async def test_read_retried_on_primary_when_replica_fails(
+    replicated_registry,
+):
+    await replicated_registry.connect()
+    first, second, down = replicated_registry.replicas
+    first.healthy = second.healthy = False
+    down.healthy = True  # Went down after its last check.
+
+    async with replicated_registry.next_read_session_factory()() as session:
+        assert await session.scalar(select(func.count(Company.id))) == 5
+        assert session.bind.sync_engine.pool is (
+            replicated_registry.engine.sync_engine.pool
+        )
+    assert not down.healthy
+
+
+async def test_request_reads_in_one_uncommitted_session(client):
+    engine = async_registry.engine.sync_engine
+    checkouts, commits = [], []
+
+    def on_checkout(*args):
+        checkouts.append(args)
+
+    def on_commit(connection):
+        commits.append(connection)
+
+    event.listen(engine, "checkout", on_checkout)
+    event.listen(engine, "commit", on_commit)
+    try:
+        response = await client.get("/api/v1/companies/search/by/activity/Еда")
+    finally:
+        event.remove(engine, "checkout", on_checkout)
+        event.remove(engine, "commit", on_commit)
+    assert response.status_code == 200
+    assert len(checkouts) == 1
+    assert commits == []
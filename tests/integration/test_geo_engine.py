@@ -0,0 +1,136 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from sqlalchemy import update
+
+from app.connectors.sql import (
+    get_async_session_factory,
+    get_sync_session_factory,
+)
+from app.models import Address, Company
+from app.services import geo_engine as geo_engine_module
+from app.services.geo_engine import GeoEngine
+from app.services.search_service import SearchService
+
+
+@pytest.mark.parametrize(
+    ("latitude", "longitude", "radius"),
+    ((59.934190, 30.332707, 1), (55.7558, 37.6173, 100)),
+)
+async def test_geo_engine_matches_sql(latitude, longitude, radius, session):
+    sql_service = SearchService(session)
+    engine_service = SearchService(session, GeoEngine())
+
+    expected = await sql_service.find_companies_by_geo(
+        latitude, longitude, radius
+    )
+    result = await engine_service.find_companies_by_geo(
+        latitude, longitude, radius
+    )
+    assert [i.id for i in result.companies] == [
+        i.id for i in expected.companies
+    ]
+    for company, expected_company in zip(result.companies, expected.companies):
+        assert company.distance == pytest.approx(
+            expected_company.distance, abs=1e-3
+        )
+
+
+async def test_geo_engine_nearest_matches_sql(session):
+    sql_service = SearchService(session)
+    engine_service = SearchService(session, GeoEngine())
+
+    expected = await sql_service.find_nearest_companies(59.93, 30.33, 4)
+    result = await engine_service.find_nearest_companies(59.93, 30.33, 4)
+    assert [i.id for i in result.companies] == [
+        i.id for i in expected.companies
+    ]
+
+
+async def test_geo_engine_invalidated_on_address_change(monkeypatch, session):
+    engine = GeoEngine()
+    monkeypatch.setattr(geo_engine_module, "_geo_engine", engine)
+    service = SearchService(session, engine)
+    await service.find_nearest_companies(59.93, 30.33, 1)
+    assert not engine.is_stale
+
+    async with get_async_session_factory() as session:
+        address = await session.get(Address, 1)
+        address.latitude += 1
+        await session.flush()
+        await session.rollback()
+    assert engine.is_stale
+
+
+async def test_geo_engine_invalidated_on_bulk_update(monkeypatch, session):
+    engine = GeoEngine()
+    monkeypatch.setattr(geo_engine_module, "_geo_engine", engine)
+    service = SearchService(session, engine)
+    await service.find_nearest_companies(59.93, 30.33, 1)
+    assert not engine.is_stale
+
+    async with get_async_session_factory() as session:
+        await session.execute(
+            update(Address)
+            .where(Address.id == 1)
+            .values(latitude=Address.latitude + 1)
+        )
+        await session.rollback()
+    assert engine.is_stale
+
+
+async def test_geo_engine_refreshed_in_background(monkeypatch, session):
+    engine = GeoEngine()
+    monkeypatch.setattr(geo_engine_module, "_geo_engine", engine)
+    await engine.ready(session)
+    expected = engine.nearest(59.93, 30.33, 1)
+
+    with get_sync_session_factory() as sync_session:
+        address = sync_session.get(Address, expected[0][0])
+        address.latitude += 10
+        sync_session.commit()
+        assert engine.is_stale
+        # The old arrays answer while they are reloaded in the background.
+        await engine.ready(session)
+        assert engine.nearest(59.93, 30.33, 1) == expected
+        await engine.refreshing
+        assert not engine.is_stale
+        assert engine.nearest(59.93, 30.33, 1) != expected
+
+        address.latitude -= 10
+        sync_session.commit()
+    assert engine.is_stale
+
+
+async def test_geo_engine_kept_on_unrelated_changes(monkeypatch, session):
+    engine = GeoEngine()
+    monkeypatch.setattr(geo_engine_module, "_geo_engine", engine)
+    await engine.ready(session)
+
+    async with get_async_session_factory() as session:
+        company = await session.get(Company, 1)
+        company.name = "Рога и копыта 2"
+        await session.flush()
+        assert not engine.is_stale
+        await session.rollback()
+
+
+async def test_geo_engine_keyset_pages_match_sql(session):
+    sql_service = SearchService(session)
+    engine_service = SearchService(session, GeoEngine())
+
+    for service in (sql_service, engine_service):
+        ids, cursor = [], None
+        while True:
+            page = await service.find_companies_by_geo(
+                59.934190, 30.332707, 1, limit=1, cursor=cursor
+            )
+            ids.extend(i.id for i in page.companies)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+        if service is sql_service:
+            expected = ids
+    assert ids == expected
+    assert len(ids) == 3
@@ -0,0 +1,127 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, select
+
+from app.connectors.sql import get_sync_session_factory
+from app.models import Address, Company, PhoneNumber, company_activities
+from app.schemas.companies import Company as CompanySchema
+from app.services.importer import CompanyImporter
+from app.services.search_service import SearchService
+from app.test_data import load_test_data
+from app.utils.enum import ChildrenCategories, MainCategories
+
+
+@pytest.fixture
+def restore_test_data():
+    yield
+    with get_sync_session_factory() as session:
+        load_test_data(session)
+
+
+def companies() -> list[CompanySchema]:
+    return [
+        CompanySchema(
+            id=1,
+            name="Рога и Копыта",
+            address="г. Москва, ул. Ленина 1",
+            latitude=55.7558,
+            longitude=37.6173,
+            phone_numbers=["1-111-111"],
+            activities=[MainCategories.FOOD],
+        ),
+        CompanySchema(
+            id=6,
+            name="Новая",
+            address="г. Казань, ул. Баумана 1",
+            latitude=55.7887,
+            longitude=49.1221,
+            phone_numbers=["6-666-666", "7-777-777"],
+            activities=[ChildrenCategories.MEAT_ACTIVITY, "Книги"],
+        ),
+        CompanySchema(
+            id=7,
+            name="Соседняя",
+            address="г. Казань, ул. Баумана 1",
+            latitude=55.7887,
+            longitude=49.1221,
+            phone_numbers=[],
+            activities=[],
+        ),
+    ]
+
+
+def updated_at(session) -> dict[int, datetime]:
+    return dict(session.execute(select(Company.id, Company.updated_at)).all())
+
+
+def table_sizes(session) -> tuple[int, ...]:
+    return tuple(
+        session.scalar(select(func.count()).select_from(table))
+        for table in (Address, PhoneNumber, company_activities)
+    )
+
+
+async def test_import_companies(restore_test_data, session):
+    with get_sync_session_factory() as sync_session:
+        report = CompanyImporter(sync_session, chunk_size=2).run(companies())
+        assert (report.rows, report.chunks) == (3, 2)
+        sizes = table_sizes(sync_session)
+
+    service = SearchService(session)
+    batch = await service.find_companies_by_ids([1, 6, 7])
+    first, new, neighbour = (i.company for i in batch.companies)
+    assert first.name == "Рога и Копыта"
+    assert first.phone_numbers == ["1-111-111"]
+    assert first.activities == [MainCategories.FOOD]
+    assert new.address == neighbour.address == "г. Казань, ул. Баумана 1"
+    assert sorted(new.activities) == sorted(
+        (ChildrenCategories.MEAT_ACTIVITY, "Книги")
+    )
+
+    with get_sync_session_factory() as sync_session:
+        before = updated_at(sync_session)
+        CompanyImporter(sync_session).run(companies())
+        assert table_sizes(sync_session) == sizes
+        assert updated_at(sync_session) == before
+
+
+def test_import_touches_changed_phone_numbers(restore_test_data):
+    records = companies()
+    with get_sync_session_factory() as sync_session:
+        CompanyImporter(sync_session).run(records)
+        before = updated_at(sync_session)
+        records[1].phone_numbers.reverse()
+        CompanyImporter(sync_session).run(records)
+        after = updated_at(sync_session)
+        numbers = sync_session.scalars(
+            select(PhoneNumber.number)
+            .where(PhoneNumber.company_id == 6)
+            .order_by(PhoneNumber.id)
+        )
+        assert numbers.all() == ["7-777-777", "6-666-666"]
+    assert [pk for pk in before if before[pk] != after[pk]] == [6]
+
+
+def test_import_tells_addresses_by_coordinates(restore_test_data):
+    same_text = [
+        CompanySchema(
+            id=pk,
+            name=f"Филиал {pk}",
+            address="ул. Ленина 1",
+            latitude=latitude,
+            longitude=37.6173,
+            phone_numbers=[],
+            activities=[],
+        )
+        for pk, latitude in ((8, 55.7558), (9, 56.8587))
+    ]
+    with get_sync_session_factory() as sync_session:
+        CompanyImporter(sync_session).run(same_text)
+        addresses = sync_session.execute(
+            select(Address.latitude)
+            .join(Company)
+            .where(Company.id.in_([8, 9]))
+            .order_by(Company.id)
+        )
+        assert addresses.scalars().all() == [55.7558, 56.8587]
@@ -0,0 +1,42 @@
+from httpx import ASGITransport, AsyncClient
+from starlette.status import HTTP_200_OK
+
+from app.main import app
+from app.services.metrics import db_queries, http_requests
+
+
+async def test_metrics_without_api_key(client: AsyncClient):
+    address = "г. Москва, ул. Ленина 1"
+    await client.get(url=f"/api/v1/companies/search/by/address/{address}")
+    async with AsyncClient(
+        base_url="http://test", transport=ASGITransport(app=app)
+    ) as anonymous:
+        response = await anonymous.get(url="/metrics")
+    assert response.status_code == HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain")
+    lines = response.text.splitlines()
+    route = "/api/v1/companies/search/by/address/{address}"
+    assert (
+        f'http_requests_total{{method="GET",route="{route}",status="200"}} '
+        f'{int(http_requests.value("GET", route, "200"))}'
+    ) in lines
+    assert any(
+        i.startswith(
+            "http_request_duration_seconds_count"
+            f'{{method="GET",route="{route}"}}'
+        )
+        for i in lines
+    )
+    assert (
+        'db_queries_total{operation="find_companies_by_address"} '
+        f'{int(db_queries.value("find_companies_by_address"))}'
+    ) in lines
+    assert "# TYPE db_pool_connections gauge" in lines
+    assert 'db_pool_connections{state="checked_out"} 0' in lines
+
+
+async def test_unmatched_routes_share_label(client: AsyncClient):
+    before = http_requests.value("GET", "unmatched", "404")
+    await client.get(url="/api/v1/unknown/1")
+    await client.get(url="/api/v1/unknown/2")
+    assert http_requests.value("GET", "unmatched", "404") == before + 2
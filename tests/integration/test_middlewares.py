@@ -0,0 +1,58 @@
+import logging
+
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import select
+
+from app.connectors.sql import get_async_session_factory
+from app.models import Company
+from app.services.metrics import statement_shape
+from app.utils.middlewares import QueryAccountingMiddleware
+
+
+async def test_server_timing_header(client: AsyncClient):
+    address = "г. Москва, ул. Ленина 1"
+    response = await client.get(
+        url=f"/api/v1/companies/search/by/address/{address}"
+    )
+    db, app, serialize = response.headers["server-timing"].split(", ")
+    assert db.startswith("db;dur=")
+    assert db.endswith(';desc="1 queries"')
+    assert app.startswith("app;dur=")
+    assert serialize.startswith("serialize;dur=")
+
+
+async def test_query_budget_and_repeated_statements(caplog, monkeypatch):
+    # Alembic's fileConfig disables loggers created before migrations.
+    monkeypatch.setattr(logging.getLogger("build-system"), "disabled", False)
+    app = FastAPI()
+
+    @app.get("/companies")
+    async def companies():
+        async with get_async_session_factory() as session:
+            for pk in (1, 2, 3):
+                await session.execute(select(Company).where(Company.id == pk))
+        return {}
+
+    wrapped = QueryAccountingMiddleware(
+        app, query_budget=2, repeated_statement_threshold=3
+    )
+    async with AsyncClient(
+        base_url="http://test", transport=ASGITransport(app=wrapped)
+    ) as client:
+        with caplog.at_level(logging.WARNING, logger="build-system"):
+            response = await client.get(url="/companies")
+
+    assert 'desc="3 queries"' in response.headers["server-timing"]
+    messages = [i.getMessage() for i in caplog.records]
+    assert "GET /companies ran 3 SQL statements, budget is 2" in messages
+    assert any(
+        i.startswith("GET /companies ran the same statement 3 times")
+        for i in messages
+    )
+
+
+def test_statement_shape_collapses_placeholder_lists():
+    assert statement_shape(
+        "SELECT id\n  FROM companies WHERE id IN (?, ?, ?)"
+    ) == statement_shape("SELECT id FROM companies WHERE id IN ($1)")
@@ -0,0 +1,121 @@
+import pytest
+from sqlalchemy import event
+
+from app.connectors.sql import async_registry, get_sync_session_factory
+from app.schemas.companies import GeoCircle, SearchCompanies
+from app.services.errors import CompanyNotFoundError
+from app.services.search_service import SearchService
+from app.services.taxonomy import ActivityTaxonomy
+from app.utils.enum import ChildrenCategories, MainCategories
+
+MOSCOW = (55.7558, 37.6173)
+
+# Service call and the tables it may read in full.
+HOT_QUERIES = {
+    "find_company_by_id": (lambda s: s.find_company_by_id(1), ()),
+    "find_companies_by_ids": (
+        lambda s: s.find_companies_by_ids([1, 3, 100]),
+        (),
+    ),
+    "find_company_by_activity": (
+        lambda s: s.find_company_by_activity(MainCategories.FOOD),
+        (),
+    ),
+    "find_company_by_activity with taxonomy": (
+        lambda s: s.find_company_by_activity(ChildrenCategories.MEAT_ACTIVITY),
+        (),
+    ),
+    "search_companies_by_name": (
+        lambda s: s.search_companies_by_name("Рога"),
+        (),
+    ),
+    "find_companies_by_address": (
+        # A leading wildcard has no index to use, one side is walked.
+        lambda s: s.find_companies_by_address("Ленина"),
+        ("addresses", "companies"),
+    ),
+    "find_companies_by_geo": (
+        lambda s: s.find_companies_by_geo(*MOSCOW, 5),
+        (),
+    ),
+    "find_companies_by_geo next page": (
+        lambda s: s.find_companies_by_geo(*MOSCOW, 5, cursor="WzAuMCwxXQ"),
+        (),
+    ),
+    "find_nearest_companies": (
+        lambda s: s.find_nearest_companies(59.934190, 30.332707, 3),
+        (),
+    ),
+    "find_companies_in_viewport companies": (
+        lambda s: s.find_companies_in_viewport(59, 30, 60, 31, 16),
+        (),
+    ),
+    "find_companies_in_viewport clusters": (
+        lambda s: s.find_companies_in_viewport(55, 37, 56, 38, 8),
+        (),
+    ),
+    "count_companies_by_activity": (
+        # The rollup counts every link of the tree, it is cached.
+        lambda s: s.count_companies_by_activity(),
+        ("activities", "activity_closure", "company_activities"),
+    ),
+    "search_companies": (
+        lambda s: s.search_companies(
+            SearchCompanies(
+                activity=MainCategories.FOOD,
+                geo=GeoCircle(
+                    latitude=MOSCOW[0], longitude=MOSCOW[1], radius=5
+                ),
+            )
+        ),
+        (),
+    ),
+}
+
+
+@pytest.fixture
+def captured_statements():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, *args):
+        statements.append((statement, parameters))
+
+    engine = async_registry.engine.sync_engine
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def full_scans(statement: str, parameters) -> set[str]:
+    """Tables the SQLite plan of ``statement`` reads without an index."""
+    with get_sync_session_factory() as session:
+        plan = session.connection().exec_driver_sql(
+            f"EXPLAIN QUERY PLAN {statement}", parameters
+        )
+        details = [row.detail for row in plan]
+    return {
+        detail.split()[1]
+        for detail in details
+        if detail.startswith("SCAN ")
+        and "USING" not in detail
+        and "VIRTUAL TABLE" not in detail
+        and not detail.startswith("SCAN CONSTANT ROW")
+        and not detail.split()[1].startswith("(")
+    } - {"activity_tree", "phone_number_rows", "activity_rows"}
+
+
+@pytest.mark.parametrize("name", HOT_QUERIES)
+async def test_hot_queries_use_indexes(name, captured_statements, session):
+    call, allowed = HOT_QUERIES[name]
+    service = SearchService(session)
+    if name.endswith("with taxonomy"):
+        service.taxonomy = ActivityTaxonomy()
+        await service.taxonomy.refresh(session)
+    captured_statements.clear()
+    try:
+        await call(service)
+    except CompanyNotFoundError:
+        pass
+    assert captured_statements
+    for statement, parameters in captured_statements:
+        assert full_scans(statement, parameters) <= set(allowed), statement
@@ -0,0 +1,40 @@
+import time
+
+from app.services.cache import LRUCache
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_size=2)
+    cache.set(1, "first")
+    cache.set(2, "second")
+    assert cache.get(1) == "first"
+    cache.set(3, "third")
+    assert cache.get(2) is None
+    assert cache.get(1) == "first"
+    assert cache.get(3) == "third"
+    assert len(cache) == 2
+
+
+def test_ttl_expires_entries(monkeypatch):
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+    cache = LRUCache(max_size=10, ttl=5)
+    cache.set(1, "value")
+    monkeypatch.setattr(time, "monotonic", lambda: now + 6)
+    assert cache.get(1) is None
+    assert len(cache) == 0
+
+
+def test_counters_and_invalidation():
+    cache = LRUCache(max_size=10)
+    cache.set(1, "value")
+    cache.get(1)
+    cache.invalidate(1)
+    cache.get(1)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_zero_size_disables_cache():
+    cache = LRUCache(max_size=0)
+    cache.set(1, "value")
+    assert cache.get(1) is None
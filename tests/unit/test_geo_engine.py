@@ -0,0 +1,84 @@
+import math
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from app.constants import EARTH_RADIUS
+from app.services.geo_engine import GeoEngine
+
+
+def haversine(lat1, long1, lat2, long2):
+    d_lat = math.radians(lat2 - lat1)
+    d_long = math.radians(long2 - long1)
+    a = (
+        math.sin(d_lat / 2) ** 2
+        + math.cos(math.radians(lat1))
+        * math.cos(math.radians(lat2))
+        * math.sin(d_long / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(a))
+
+
+@pytest.fixture(scope="module")
+def points():
+    rng = random.Random(42)
+    return [
+        (pk, rng.uniform(54, 57), rng.uniform(36, 39)) for pk in range(1, 2001)
+    ] + [(3001, 0.0, 179.99), (3002, 0.0, -179.99)]
+
+
+@pytest.fixture(scope="module")
+def engine(points):
+    engine = GeoEngine()
+    engine.load(points)
+    return engine
+
+
+def brute_force(points, lat, long):
+    return sorted(
+        (haversine(lat, long, p_lat, p_long), pk)
+        for pk, p_lat, p_long in points
+    )
+
+
+@pytest.mark.parametrize("radius", (1, 10, 50))
+def test_within_radius_matches_brute_force(engine, points, radius):
+    lat, long = 55.7558, 37.6173
+    expected = [
+        pk
+        for distance, pk in brute_force(points, lat, long)
+        if distance <= radius
+    ]
+    result = engine.within_radius(lat, long, radius)
+    assert [pk for pk, _ in result] == expected
+
+
+@pytest.mark.parametrize("limit", (1, 5, 100))
+def test_nearest_matches_brute_force(engine, points, limit):
+    lat, long = 56.5, 37.0
+    expected = brute_force(points, lat, long)[:limit]
+    result = engine.nearest(lat, long, limit)
+    assert [pk for pk, _ in result] == [pk for _, pk in expected]
+    for (_, distance), (expected_distance, _) in zip(result, expected):
+        assert distance == pytest.approx(expected_distance, abs=1e-6)
+
+
+def test_radius_across_antimeridian(engine):
+    result = engine.within_radius(0.0, 180.0, 5)
+    assert {pk for pk, _ in result} == {3001, 3002}
+
+
+def test_nearest_far_from_everything(engine):
+    result = engine.nearest(-60.0, -100.0, 3)
+    assert len(result) == 3
+
+
+def test_invalidate_marks_stale(points):
+    engine = GeoEngine()
+    assert engine.is_stale
+    engine.load(points)
+    assert not engine.is_stale
+    engine.invalidate()
+    assert engine.is_stale
@@ -0,0 +1,28 @@
+from app.services.importer import read_csv, read_ndjson
+
+
+def test_read_csv(tmp_path):
+    path = tmp_path / "companies.csv"
+    path.write_text(
+        "id,name,address,latitude,longitude,phone_numbers,activities\n"
+        '1,"Рога, Копыта",Москва,55.75,37.61,1-111;2-222,Еда\n'
+        "2,Гидро,Казань,55.78,49.12,,\n",
+        encoding="utf-8",
+    )
+    first, second = read_csv(path)
+    assert first.name == "Рога, Копыта"
+    assert first.phone_numbers == ["1-111", "2-222"]
+    assert first.activities == ["Еда"]
+    assert (second.phone_numbers, second.activities) == ([], [])
+
+
+def test_read_ndjson(tmp_path):
+    path = tmp_path / "companies.ndjson"
+    path.write_text(
+        '{"id": 1, "name": "Гидро", "address": "Казань", "latitude": 55.78, '
+        '"longitude": 49.12, "phone_numbers": [], "activities": ["Еда"]}\n'
+        "\n",
+        encoding="utf-8",
+    )
+    (company,) = read_ndjson(path)
+    assert company.activities == ["Еда"]
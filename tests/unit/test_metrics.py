@@ -0,0 +1,56 @@
+import asyncio
+
+from app.services.metrics import (
+    Callback,
+    Counter,
+    Histogram,
+    current_operation,
+    db_operation,
+)
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency", "Latency.", ("route",), (0.1, 1))
+    for value in (0.05, 0.5, 0.7, 5):
+        histogram.observe(value, "/a")
+    assert histogram.render().splitlines()[2:] == [
+        'latency_bucket{route="/a",le="0.1"} 1',
+        'latency_bucket{route="/a",le="1"} 3',
+        'latency_bucket{route="/a",le="+Inf"} 4',
+        'latency_sum{route="/a"} 6.25',
+        'latency_count{route="/a"} 4',
+    ]
+
+
+def test_counter_labels_are_escaped():
+    counter = Counter("requests_total", "Requests.", ("path",))
+    counter.inc('/a"b')
+    counter.inc('/a"b', amount=2)
+    assert counter.render().splitlines() == [
+        "# HELP requests_total Requests.",
+        "# TYPE requests_total counter",
+        'requests_total{path="/a\\"b"} 3',
+    ]
+
+
+def test_callback_reads_values_on_render():
+    values = {"size": 1}
+    gauge = Callback(
+        "pool", "Pool.", lambda: [((k,), v) for k, v in values.items()], ("s",)
+    )
+    values["size"] = 5
+    assert gauge.render().splitlines()[-1] == 'pool{s="size"} 5'
+
+
+async def test_db_operation_labels_generator_steps():
+    @db_operation
+    async def export():
+        for _ in range(3):
+            yield current_operation.get()
+
+    generator = export()
+    assert await anext(generator) == "export"
+    assert current_operation.get() == "other"
+    # Closed from another task, as when a client drops a streamed response.
+    await asyncio.create_task(generator.aclose())
+    assert current_operation.get() == "other"
@@ -0,0 +1,24 @@
+import time
+
+from app.services.rate_limit import RateLimiter
+from app.settings import get_current_config
+
+
+def test_bucket_allows_burst_then_refills(monkeypatch):
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+    limiter = RateLimiter(rate=2, burst=3)
+    assert [limiter.allow("a") for _ in range(4)] == [True, True, True, False]
+    assert limiter.retry_after("a") == 1
+    assert limiter.allow("b")
+
+    now += 0.5
+    assert limiter.allow("a")
+    assert not limiter.allow("a")
+
+    now += 10
+    assert [limiter.allow("a") for _ in range(4)] == [True, True, True, False]
+
+
+def test_config_is_read_once():
+    assert get_current_config() is get_current_config()
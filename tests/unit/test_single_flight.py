@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from app.services.single_flight import SingleFlight
+
+
+async def test_concurrent_calls_share_one_run():
+    single_flight = SingleFlight()
+    calls = []
+
+    async def search():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return ["company"]
+
+    results = await asyncio.gather(
+        *(single_flight.run(("search", "Еда"), search) for _ in range(3))
+    )
+    assert results == [["company"]] * 3
+    assert results[0] is results[2]
+    assert len(calls) == 1
+    assert single_flight.coalesced["search"] == 2
+    assert len(single_flight) == 0
+
+    await single_flight.run(("search", "Еда"), search)
+    assert len(calls) == 2
+
+
+async def test_error_is_shared_and_not_kept():
+    single_flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise LookupError
+
+    results = await asyncio.gather(
+        single_flight.run(("search",), fail),
+        single_flight.run(("search",), fail),
+        return_exceptions=True,
+    )
+    assert all(isinstance(i, LookupError) for i in results)
+    assert len(single_flight) == 0
+
+
+async def test_waiting_call_runs_when_first_is_cancelled():
+    single_flight = SingleFlight()
+
+    async def search():
+        await asyncio.sleep(0.01)
+        return "result"
+
+    first = asyncio.ensure_future(single_flight.run(("search",), search))
+    second = asyncio.ensure_future(single_flight.run(("search",), search))
+    await asyncio.sleep(0)
+    first.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    assert await second == "result"
@@ -0,0 +1,35 @@
+from app.services.taxonomy import ActivityTaxonomy
+
+ROWS = (
+    (1, None, "Еда"),
+    (2, 1, "Мясная продукция"),
+    (3, 2, "Говядина"),
+    (4, 3, "Стейки"),
+    (5, 4, "Рибай"),
+    (6, None, "Автомобили"),
+)
+
+
+def test_descendants_limited_by_depth():
+    taxonomy = ActivityTaxonomy(depth=3)
+    taxonomy.load(ROWS)
+    assert taxonomy.descendants(1) == {1, 2, 3, 4}
+    assert taxonomy.descendants(3) == {3, 4, 5}
+    assert taxonomy.descendants(6) == {6}
+    assert taxonomy.descendants(100) == frozenset()
+
+
+def test_names_are_case_insensitive():
+    taxonomy = ActivityTaxonomy()
+    taxonomy.load(ROWS)
+    assert taxonomy.subtree_by_name("мясная ПРОДУКЦИЯ") == {2, 3, 4, 5}
+    assert taxonomy.subtree_by_name("Рыба") is None
+
+
+def test_check_interval_makes_cache_stale():
+    taxonomy = ActivityTaxonomy(check_interval=0)
+    taxonomy.load(ROWS)
+    assert taxonomy.is_stale
+    taxonomy = ActivityTaxonomy(check_interval=None)
+    taxonomy.load(ROWS)
+    assert not taxonomy.is_stale